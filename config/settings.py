@@ -58,6 +58,15 @@ LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "core:home"   # set this to your landing page name
 LOGOUT_REDIRECT_URL = "login"
 
+# Intelligence ingest: "inline" keeps RawRecord.payload as JSON on the row,
+# "compressed" stores each distinct payload once in PayloadBlob.
+INTELLIGENCE_PAYLOAD_STORAGE = env('INTELLIGENCE_PAYLOAD_STORAGE', default='inline')
+INTELLIGENCE_PAYLOAD_CODEC = env('INTELLIGENCE_PAYLOAD_CODEC', default='zlib')  # or "zstd" (needs zstandard)
+
+# Modules defining @register_connector classes / @register_mapper functions.
+INTELLIGENCE_CONNECTOR_MODULES = []
+INTELLIGENCE_MAPPER_MODULES = []
+
 ####
 
 
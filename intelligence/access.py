@@ -0,0 +1,234 @@
+"""
+Materialized effective access: which identities can reach which assets, and how.
+
+EffectiveAccess rows are derived in three set-based INSERT ... SELECT passes:
+
+    direct  identity -[has_access_to|admin_of]-> asset
+    group   identity in group (Group.members or a MEMBER_OF edge),
+            group -[has_access_to|admin_of]-> asset
+    role    identity (or one of its groups) -[assumes_role]-> role (group or identity),
+            role -[has_access_to|admin_of]-> asset
+
+Refreshes are scoped to the affected identities: membership changes and
+edge deletions (admin, ORM) refresh through signals, new edges from
+edges.assert_edges() and expired edges from edges.decay_edges() refresh
+directly, and refresh_changed() picks up any other edge written since the
+last refresh (manage.py refresh_effective_access).
+"""
+from __future__ import annotations
+import uuid
+from typing import Any, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    AccessPath, Asset, EffectiveAccess, EntityRelationship, EntityType,
+    Group, Identity, RelationshipType,
+)
+
+GRANTS = (RelationshipType.HAS_ACCESS_TO, RelationshipType.ADMIN_OF)
+# Edge types that can change effective access when added or removed.
+ACCESS_EDGE_TYPES = GRANTS + (RelationshipType.ASSUMES_ROLE, RelationshipType.MEMBER_OF)
+
+EdgeKey = Tuple[str, uuid.UUID, str, str, uuid.UUID]
+
+
+def _q(model) -> str:
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _paths_sql(identity_ids: Optional[Sequence[uuid.UUID]] = None) -> Tuple[str, List[Any]]:
+    """
+    SELECT of every (identity_id, asset_id, access, path, via_group_id) access
+    path, with params. With `identity_ids`, each branch is restricted up front
+    so a scoped refresh never reads other identities' memberships.
+    """
+    rel = _q(EntityRelationship)
+    through = Group.members.through
+    members = _q(through)
+    m_group = through._meta.get_field("group").column
+    m_identity = through._meta.get_field("identity").column
+    ident, grp, asset = EntityType.IDENTITY, EntityType.GROUP, EntityType.ASSET
+
+    def only(column: str) -> Tuple[str, List[Any]]:
+        if identity_ids is None:
+            return "", []
+        id_field = Identity._meta.pk
+        return (f" AND {column} IN ({', '.join(['%s'] * len(identity_ids))})",
+                [id_field.get_db_prep_value(i, connection) for i in identity_ids])
+
+    def membership() -> Tuple[str, List[Any]]:
+        m_only, m_params = only(m_identity)
+        e_only, e_params = only("from_entity_id")
+        sql = f"""(SELECT {m_identity} AS identity_id, {m_group} AS group_id FROM {members} WHERE 1 = 1{m_only}
+            UNION SELECT from_entity_id, to_entity_id FROM {rel}
+            WHERE relationship_type = %s AND from_entity_type = %s AND to_entity_type = %s{e_only})"""
+        return sql, m_params + [RelationshipType.MEMBER_OF, ident, grp] + e_params
+
+    grants = f"""(SELECT from_entity_type AS principal_type, from_entity_id AS principal_id,
+               to_entity_id AS asset_id, relationship_type AS access
+        FROM {rel} WHERE to_entity_type = %s AND relationship_type IN (%s, %s))"""
+    grants_params = [asset, *GRANTS]
+
+    direct_only, direct_params = only("g.principal_id")
+    role_only, role_params = only("a.from_entity_id")
+    group_m, group_m_params = membership()
+    role_m, role_m_params = membership()
+    sql = f"""
+        SELECT g.principal_id AS identity_id, g.asset_id AS asset_id, g.access AS access,
+               %s AS path, NULL AS via_group_id
+        FROM {grants} g WHERE g.principal_type = %s{direct_only}
+        UNION ALL
+        SELECT m.identity_id, g.asset_id, g.access, %s, m.group_id
+        FROM {group_m} m JOIN {grants} g ON g.principal_type = %s AND g.principal_id = m.group_id
+        UNION ALL
+        SELECT a.from_entity_id, g.asset_id, g.access, %s,
+               CASE WHEN a.to_entity_type = %s THEN a.to_entity_id END
+        FROM {rel} a JOIN {grants} g ON g.principal_type = a.to_entity_type AND g.principal_id = a.to_entity_id
+        WHERE a.relationship_type = %s AND a.from_entity_type = %s{role_only}
+        UNION ALL
+        SELECT m.identity_id, g.asset_id, g.access, %s,
+               CASE WHEN a.to_entity_type = %s THEN a.to_entity_id ELSE m.group_id END
+        FROM {role_m} m
+        JOIN {rel} a ON a.from_entity_type = %s AND a.from_entity_id = m.group_id AND a.relationship_type = %s
+        JOIN {grants} g ON g.principal_type = a.to_entity_type AND g.principal_id = a.to_entity_id
+    """
+    params = [
+        AccessPath.DIRECT, *grants_params, ident, *direct_params,
+        AccessPath.GROUP, *group_m_params, *grants_params, grp,
+        AccessPath.ROLE, grp, *grants_params, RelationshipType.ASSUMES_ROLE, ident, *role_params,
+        AccessPath.ROLE, grp, *role_m_params, grp, RelationshipType.ASSUMES_ROLE, *grants_params,
+    ]
+    return sql, params
+
+
+def _insert(identity_ids: Optional[Sequence[uuid.UUID]] = None, missing_only: bool = False) -> int:
+    paths, params = _paths_sql(identity_ids)
+    now = EffectiveAccess._meta.get_field("computed_at").get_db_prep_value(timezone.now(), connection)
+    ea = EffectiveAccess._meta
+    sql = f"""
+        INSERT INTO {_q(EffectiveAccess)} ({ea.get_field("identity").column}, {ea.get_field("asset").column},
+            access, path, {ea.get_field("via_group").column}, computed_at)
+        SELECT DISTINCT x.identity_id, x.asset_id, x.access, x.path, grp.id, %s
+        FROM ({paths}) x
+        JOIN {_q(Identity)} i ON i.id = x.identity_id
+        JOIN {_q(Asset)} s ON s.id = x.asset_id
+        LEFT JOIN {_q(Group)} grp ON grp.id = x.via_group_id
+    """
+    if missing_only:
+        sql += f"""
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {_q(EffectiveAccess)} e
+            WHERE e.{ea.get_field("identity").column} = x.identity_id AND e.{ea.get_field("asset").column} = x.asset_id
+              AND e.access = x.access AND e.path = x.path
+              AND (e.{ea.get_field("via_group").column} = grp.id OR (e.{ea.get_field("via_group").column} IS NULL AND grp.id IS NULL))
+        )
+        """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [now] + params)
+        return cursor.rowcount
+
+
+def rebuild_effective_access() -> int:
+    """Recompute the whole table. Returns rows written."""
+    with transaction.atomic():
+        EffectiveAccess.objects.all().delete()
+        return _insert()
+
+
+def refresh_identities(identity_ids: Iterable[uuid.UUID], additions_only: bool = False, chunk_size: int = 200) -> int:
+    """
+    Recompute the rows of the given identities only. Returns rows written.
+    With `additions_only` (nothing was removed, e.g. after inserting edges)
+    existing rows are kept and only missing ones are inserted.
+    """
+    ids = list(set(identity_ids))
+    written = 0
+    for i in range(0, len(ids), chunk_size):
+        part = ids[i:i + chunk_size]
+        with transaction.atomic():
+            if not additions_only:
+                EffectiveAccess.objects.filter(identity_id__in=part).delete()
+            written += _insert(part, missing_only=additions_only)
+    return written
+
+
+def _group_members(group_ids: Set[uuid.UUID]) -> Set[uuid.UUID]:
+    if not group_ids:
+        return set()
+    members = set(Group.members.through.objects.filter(group_id__in=group_ids).values_list("identity_id", flat=True))
+    members.update(EntityRelationship.objects.filter(
+        relationship_type=RelationshipType.MEMBER_OF, from_entity_type=EntityType.IDENTITY,
+        to_entity_type=EntityType.GROUP, to_entity_id__in=group_ids,
+    ).values_list("from_entity_id", flat=True))
+    return members
+
+
+def affected_identities(edges: Iterable[EdgeKey]) -> Set[uuid.UUID]:
+    """Identities whose effective access may change when `edges` are added or removed."""
+    identities: Set[uuid.UUID] = set()
+    groups: Set[uuid.UUID] = set()
+    principals: Set[uuid.UUID] = set()  # anything that might be a role someone assumes
+    for from_type, from_id, rel_type, _to_type, _to_id in edges:
+        if rel_type not in ACCESS_EDGE_TYPES:
+            continue
+        if from_type == EntityType.IDENTITY:
+            identities.add(from_id)
+        elif from_type == EntityType.GROUP:
+            groups.add(from_id)
+        if rel_type in GRANTS:
+            principals.add(from_id)
+    if principals:
+        assuming = EntityRelationship.objects.filter(
+            relationship_type=RelationshipType.ASSUMES_ROLE, to_entity_id__in=principals,
+        ).values_list("from_entity_type", "from_entity_id")
+        for from_type, from_id in assuming:
+            (identities if from_type == EntityType.IDENTITY else groups).add(from_id)
+    return identities | _group_members(groups)
+
+
+def delete_edges(edges) -> int:
+    """
+    Delete the EntityRelationship queryset `edges` in one statement, without
+    refreshing effective access. For bulk deletes that refresh the affected
+    identities themselves. Returns rows deleted.
+    """
+    return edges._raw_delete(edges.db)
+
+
+def delete_and_refresh(edges) -> int:
+    """
+    delete_edges() plus one refresh of the identities whose access the deleted
+    edges granted. Backs EntityRelationship's QuerySet.delete() and
+    Model.delete(). Returns rows deleted.
+    """
+    keys = edges.filter(relationship_type__in=ACCESS_EDGE_TYPES).values_list(
+        "from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id",
+    )
+    with transaction.atomic(using=edges.db):
+        # Looked up before the delete, while the memberships and role edges being removed still exist.
+        identities = affected_identities(keys.iterator(chunk_size=5000))
+        deleted = delete_edges(edges)
+        refresh_identities(identities)
+    return deleted
+
+
+def refresh_changed(since=None) -> int:
+    """
+    Refresh identities affected by access edges written after `since`
+    (default: the last refresh). Deleted edges refresh as they go (see
+    delete_and_refresh()). Returns identities refreshed.
+    """
+    if since is None:
+        since = EffectiveAccess.objects.aggregate(last=Max("computed_at"))["last"]
+        if since is None:
+            rebuild_effective_access()
+            return Identity.objects.count()
+    edges = EntityRelationship.objects.filter(updated_at__gt=since, relationship_type__in=ACCESS_EDGE_TYPES).values_list(
+        "from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id",
+    )
+    identities = affected_identities(edges.iterator(chunk_size=5000))
+    refresh_identities(identities)
+    return len(identities)
@@ -5,8 +5,8 @@ from .models import (
     Environment, Location,
     Identity, Group,
     Asset,
-    EntityRelationship,
-    SyncRun, RawRecord
+    EntityRelationship, EffectiveAccess,
+    SyncRun, SyncWatermark, RawRecord, ConnectorLease, IntegrityScan
 )
 
 @admin.register(ExternalID)
@@ -68,20 +68,65 @@ class AssetAdmin(admin.ModelAdmin):
 
 @admin.register(EntityRelationship)
 class EntityRelationshipAdmin(admin.ModelAdmin):
-    list_display = ("from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id", "source", "confidence", "updated_at")
+    list_display = ("from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id", "source", "asserted_by",
+                    "confidence", "last_confirmed_at", "updated_at")
     list_filter = ("relationship_type", "source")
+    readonly_fields = ("source_mask",)
+
+    @admin.display(description="Asserted by")
+    def asserted_by(self, obj):
+        return ", ".join(obj.sources)
     search_fields = ("from_entity_id", "to_entity_id")
 
 
+@admin.register(EffectiveAccess)
+class EffectiveAccessAdmin(admin.ModelAdmin):
+    list_display = ("identity", "asset", "access", "path", "via_group", "computed_at")
+    list_filter = ("access", "path")
+    list_select_related = ("identity", "asset", "via_group")
+    raw_id_fields = ("identity", "asset", "via_group")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SyncRun)
 class SyncRunAdmin(admin.ModelAdmin):
-    list_display = ("source", "started_at", "finished_at", "success")
+    list_display = ("source", "started_at", "finished_at", "success", "records_fetched", "records_stored", "records_skipped",
+                    "bytes_fetched", "fetch_seconds", "write_seconds", "rows_per_sec", "batch_p95_ms", "records_pruned")
+    readonly_fields = ("metrics",)
     list_filter = ("source", "success")
     search_fields = ("summary", "error")
 
 
+@admin.register(IntegrityScan)
+class IntegrityScanAdmin(admin.ModelAdmin):
+    list_display = ("started_at", "finished_at", "orphan_count", "deleted")
+    readonly_fields = ("orphans",)
+
+
+@admin.register(SyncWatermark)
+class SyncWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("source", "record_type", "cursor", "sync_run", "updated_at")
+    list_filter = ("source",)
+    search_fields = ("record_type", "cursor")
+
+
+@admin.register(ConnectorLease)
+class ConnectorLeaseAdmin(admin.ModelAdmin):
+    list_display = ("name", "holder", "acquired_at", "expires_at")
+
+
 @admin.register(RawRecord)
 class RawRecordAdmin(admin.ModelAdmin):
     list_display = ("source", "record_type", "external_id", "processed", "sync_run", "updated_at")
     list_filter = ("source", "record_type", "processed")
-    search_fields = ("external_id",)
+    search_fields = ("external_id", "content_hash")
+    readonly_fields = ("stored_payload",)
+
+    @admin.display(description="Payload")
+    def stored_payload(self, obj):
+        return obj.get_payload()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import asyncio
+import json
+import queue
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from .base import BaseConnector
+
+_DONE = object()
+
+
+class AsyncBaseConnector(BaseConnector):
+    """
+    Variant of BaseConnector for paginated REST sources (Okta, Duo, ServiceNow table API).
+    Pattern:
+      - fetch_page(page) returns one page of raw dicts; a short page ends the walk
+      - fetch_records() is an async generator keeping up to max_concurrency pages in flight
+      - ingest() is inherited: pages are fetched on a background event loop while the
+        calling thread bulk-writes finished batches, so it still works from management commands
+    Cursor-paged APIs (e.g. Okta's Link: next) can override fetch_records() directly.
+    """
+    max_concurrency: int = 4
+    page_size: int = 100
+    request_timeout: float = 30.0
+    prefetch_batches: int = 4  # finished batches buffered ahead of the DB writer
+    retries: int = 2  # extra attempts on connection errors, timeouts, 429 and 5xx
+    retry_backoff: float = 0.5  # seconds before the first retry, doubled for each one after
+
+    async def fetch_page(self, page: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def fetch_records(self) -> AsyncIterator[Dict[str, Any]]:
+        async for records in self.fetch_pages():
+            for record in records:
+                yield record
+
+    async def fetch_pages(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Fetch pages 0, 1, 2, ... through a sliding window of max_concurrency requests.
+        Pages are yielded in order; the first short page stops the walk.
+        """
+        pending: Deque[asyncio.Task] = deque()
+        next_page = 0
+        try:
+            while True:
+                while len(pending) < self.max_concurrency:
+                    pending.append(asyncio.ensure_future(self.fetch_page(next_page)))
+                    next_page += 1
+                records = await pending.popleft()
+                if records:
+                    yield records
+                if len(records) < self.page_size:
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None,
+                       headers: Optional[Dict[str, str]] = None) -> Any:
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url, headers={"Accept": "application/json", **(headers or {})})
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.to_thread(self._urlopen_json, request)
+            except urllib.error.HTTPError as e:
+                if attempt == self.retries or (e.code != 429 and e.code < 500):
+                    raise
+            except (urllib.error.URLError, TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _urlopen_json(self, request: urllib.request.Request) -> Any:
+        with urllib.request.urlopen(request, timeout=self.request_timeout) as resp:
+            return json.load(resp)
+
+    # ---- sync bridge ----
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        batches: queue.Queue = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        async def produce() -> None:
+            batch: List[Dict[str, Any]] = []
+            async for record in self.fetch_records():
+                batch.append(record)
+                if len(batch) >= self.config.batch_size:
+                    if not await asyncio.to_thread(put, batch):
+                        return
+                    batch = []
+            if batch:
+                await asyncio.to_thread(put, batch)
+
+        def run() -> None:
+            try:
+                asyncio.run(produce())
+            except BaseException as e:
+                put(e)
+            else:
+                put(_DONE)
+
+        fetcher = threading.Thread(target=run, name=f"{self.config.source}-fetch", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            fetcher.join()
@@ -1,8 +1,19 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Iterable, Any, Dict, Optional
+import math
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterable, Iterator, Any, Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
-from ..models import SyncRun, RawRecord, SourceSystem
+from django.utils.dateparse import parse_datetime
+from ..models import SyncRun, SyncWatermark, RawRecord, SourceSystem
+from ..normalization import NormalizeResult, normalize_pending
+from ..payloads import compression_enabled, offload, payload_digest
 
 
 @dataclass
@@ -10,20 +21,74 @@ class ConnectorConfig:
     source: str
     enabled: bool = True
     priority: int = 100  # lower wins in conflicts
+    batch_size: int = 1000  # RawRecords per bulk INSERT / transaction
+    incremental: bool = True  # skip payloads whose content hash is already stored
+    touch_unchanged: bool = True  # bump updated_at on the stored copy of skipped payloads
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield lists of up to `size` items from `iterable` without materializing it."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def percentiles(values: List[float], points: Tuple[int, ...] = (50, 95, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles plus max, rounded to 0.1."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    out = {f"p{p}": round(ordered[max(0, math.ceil(p * len(ordered) / 100) - 1)], 1) for p in points}
+    out["max"] = round(ordered[-1], 1)
+    return out
+
+
+@dataclass
+class IngestStats:
+    fetched: int = 0
+    stored: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    fetch_seconds: float = 0.0
+    write_seconds: float = 0.0
+    batch_ms: List[float] = field(default_factory=list)
+
+    def apply(self, run: SyncRun, elapsed: float) -> None:
+        run.records_fetched = self.fetched
+        run.records_stored = self.stored
+        run.records_skipped = self.skipped
+        run.bytes_fetched = self.bytes
+        run.fetch_seconds = round(self.fetch_seconds, 3)
+        run.write_seconds = round(self.write_seconds, 3)
+        run.rows_per_sec = (self.stored + self.skipped) / elapsed if elapsed > 0 else None
+        run.metrics = {
+            "batches": len(self.batch_ms),
+            "batch_write_ms": percentiles(self.batch_ms),
+            "elapsed_seconds": round(elapsed, 3),
+        }
 
 
 class BaseConnector:
     """
     Extend this for ServiceNow, Flexera, Okta, AD, Duo, etc.
     Pattern:
-      - fetch_records() yields raw dicts
-      - ingest() stores RawRecord entries
-      - normalize() maps into your internal models
+      - fetch_records() yields raw dicts (use self.watermark to only ask for changes)
+      - ingest() stores RawRecord entries in bulk, one transaction per batch,
+        skipping payloads that are byte-for-byte unchanged since a previous run
+      - normalize() maps pending RawRecords into the inventory models through the
+        mappers registered for this source/record_type (see normalization.register_mapper)
     """
     config: ConnectorConfig
+    cursor_field: Optional[str] = None  # payload key holding the last-modified value, e.g. "sys_updated_on"
 
     def __init__(self, config: ConnectorConfig):
         self.config = config
+        self.watermark: str = ""
+        self._max_cursor: str = ""
+        self.stats = IngestStats()
 
     def fetch_records(self) -> Iterable[Dict[str, Any]]:
         raise NotImplementedError
@@ -34,30 +99,173 @@ class BaseConnector:
     def external_id_from_payload(self, payload: Dict[str, Any]) -> str:
         return payload.get("id") or payload.get("sys_id") or ""
 
+    def cursor_from_payload(self, payload: Dict[str, Any]) -> str:
+        if not self.cursor_field:
+            return ""
+        value = payload.get(self.cursor_field)
+        return str(value) if value is not None else ""
+
+    def cursor_key(self, cursor: str) -> tuple:
+        """
+        Sort key for cursor values: numbers compare numerically ("9" < "10"),
+        ISO timestamps chronologically (naive ones taken as UTC), anything else
+        as text. Override for cursors with their own ordering.
+        """
+        if not cursor:
+            return (0,)
+        try:
+            number = Decimal(cursor)
+            if number.is_finite():
+                return (1, number)
+        except InvalidOperation:
+            pass
+        try:
+            moment = parse_datetime(cursor)
+        except ValueError:
+            moment = None
+        if moment is not None:
+            return (2, moment if moment.tzinfo else moment.replace(tzinfo=dt_timezone.utc))
+        return (3, cursor)
+
+    def load_watermark(self) -> str:
+        return (
+            SyncWatermark.objects
+            .filter(source=self.config.source, record_type=self.record_type())
+            .values_list("cursor", flat=True)
+            .first()
+        ) or ""
+
+    def save_watermark(self, run: SyncRun) -> None:
+        if not self._max_cursor or self.cursor_key(self._max_cursor) <= self.cursor_key(self.watermark):
+            return
+        SyncWatermark.objects.update_or_create(
+            source=self.config.source,
+            record_type=self.record_type(),
+            defaults={"cursor": self._max_cursor, "sync_run": run},
+        )
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        return chunked(self.fetch_records(), self.config.batch_size)
+
+    def build_raw_records(self, run: SyncRun, payloads: List[Dict[str, Any]]) -> List[RawRecord]:
+        record_type = self.record_type()
+        source = self.config.source
+        external_id = self.external_id_from_payload
+        records = []
+        for payload in payloads:
+            digest, nbytes = payload_digest(payload)
+            self.stats.bytes += nbytes
+            records.append(RawRecord(
+                sync_run=run,
+                source=source,
+                record_type=record_type,
+                external_id=external_id(payload),
+                payload=payload,
+                content_hash=digest,
+                processed=False,
+            ))
+        return records
+
+    def split_unchanged(self, records: List[RawRecord]) -> Tuple[List[RawRecord], List[RawRecord]]:
+        """
+        Partition a batch into (changed, unchanged). A record is unchanged when its
+        hash equals the *newest* stored one for its external_id, so A -> B -> A stores
+        the final A again; records without an external_id are unchanged when any
+        stored one has the same hash. Duplicates within the batch count as unchanged.
+        Each unchanged record takes the pk of the row holding its content (stored, or
+        an earlier record of this batch), so touching it updates exactly that row.
+        """
+        if not records:
+            return [], []
+        stored = RawRecord.objects.filter(source=self.config.source, record_type=records[0].record_type)
+        keyed = {r.external_id for r in records if r.external_id}
+        newest = stored.filter(external_id=OuterRef("external_id")).order_by("-created_at", "-id")
+        latest: Dict[str, Tuple[str, Any]] = {
+            external_id: (content_hash, pk)
+            for external_id, content_hash, pk in
+            stored.filter(external_id__in=keyed, pk=Subquery(newest.values("pk")[:1]))
+            .values_list("external_id", "content_hash", "pk")
+        } if keyed else {}
+        blank = {r.content_hash for r in records if not r.external_id}
+        anonymous: Dict[str, Any] = dict(
+            stored.filter(external_id="", content_hash__in=blank).values_list("content_hash", "pk")
+        ) if blank else {}
+        changed, unchanged = [], []
+        for r in records:
+            if r.external_id:
+                content_hash, pk = latest.get(r.external_id, (None, None))
+                same = content_hash == r.content_hash
+            else:
+                pk = anonymous.get(r.content_hash)
+                same = pk is not None
+            if same:
+                r.pk = pk
+                unchanged.append(r)
+            else:
+                changed.append(r)
+            if r.external_id:
+                latest[r.external_id] = (r.content_hash, r.pk)
+            else:
+                anonymous[r.content_hash] = r.pk
+        return changed, unchanged
+
+    def write_batch(self, run: SyncRun, payloads: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Store one batch; returns (stored, skipped)."""
+        records = self.build_raw_records(run, payloads)
+        if self.cursor_field:
+            self._max_cursor = max([self._max_cursor] + [self.cursor_from_payload(p) for p in payloads],
+                                   key=self.cursor_key)
+
+        unchanged: List[RawRecord] = []
+        if self.config.incremental:
+            records, unchanged = self.split_unchanged(records)
+
+        with transaction.atomic():
+            if compression_enabled():
+                offload(records)
+            RawRecord.objects.bulk_create(records, batch_size=self.config.batch_size)
+            if unchanged and self.config.touch_unchanged:
+                RawRecord.objects.filter(pk__in={r.pk for r in unchanged}).update(updated_at=timezone.now())
+        return len(records), len(unchanged)
+
+    def normalize(self, chunk_size: int = 1000) -> NormalizeResult:
+        return normalize_pending(chunk_size=chunk_size, source=self.config.source, record_type=self.record_type())
+
     def ingest(self) -> SyncRun:
         run = SyncRun.objects.create(
             source=self.config.source,
             started_at=timezone.now(),
             success=False,
         )
+        self.watermark = self._max_cursor = self.load_watermark()
+        self.stats = stats = IngestStats()
 
+        t0 = time.monotonic()
         try:
-            for payload in self.fetch_records():
-                RawRecord.objects.create(
-                    sync_run=run,
-                    source=self.config.source,
-                    record_type=self.record_type(),
-                    external_id=self.external_id_from_payload(payload),
-                    payload=payload,
-                    processed=False,
-                )
+            with closing(self.iter_batches()) as batches:
+                while True:
+                    t_fetch = time.monotonic()
+                    batch = next(batches, None)
+                    t_write = time.monotonic()
+                    stats.fetch_seconds += t_write - t_fetch
+                    if batch is None:
+                        break
+                    stats.fetched += len(batch)
+                    n_stored, n_skipped = self.write_batch(run, batch)
+                    stats.stored += n_stored
+                    stats.skipped += n_skipped
+                    done = time.monotonic()
+                    stats.write_seconds += done - t_write
+                    stats.batch_ms.append((done - t_write) * 1000)
 
+            self.save_watermark(run)
             run.success = True
             run.summary = "Ingest complete."
         except Exception as e:
             run.success = False
             run.error = str(e)
         finally:
+            stats.apply(run, time.monotonic() - t0)
             run.finished_at = timezone.now()
             run.save()
 
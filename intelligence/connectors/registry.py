@@ -0,0 +1,42 @@
+from __future__ import annotations
+from dataclasses import replace
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from django.conf import settings
+
+from .base import BaseConnector, ConnectorConfig
+
+_CONNECTORS: Dict[str, Tuple[Type[BaseConnector], ConnectorConfig]] = {}
+
+
+def register_connector(source: str, name: str = "", **config: Any) -> Callable[[Type[BaseConnector]], Type[BaseConnector]]:
+    """
+    Class decorator making a connector visible to the scheduler, e.g.
+
+        @register_connector(SourceSystem.OKTA, priority=10, batch_size=500)
+        class OktaUsers(AsyncBaseConnector): ...
+
+    `config` holds ConnectorConfig defaults; settings.INTELLIGENCE_CONNECTORS[name]
+    can override them per deployment (e.g. {"OktaUsers": {"enabled": False}}).
+    """
+    def decorator(cls: Type[BaseConnector]) -> Type[BaseConnector]:
+        _CONNECTORS[name or cls.__name__] = (cls, ConnectorConfig(source=source, **config))
+        return cls
+    return decorator
+
+
+def autodiscover_connectors() -> None:
+    """Import settings.INTELLIGENCE_CONNECTOR_MODULES so their @register_connector classes load."""
+    for module in getattr(settings, "INTELLIGENCE_CONNECTOR_MODULES", []):
+        import_module(module)
+
+
+def registered_connectors() -> List[Tuple[str, Type[BaseConnector], ConnectorConfig]]:
+    """(name, class, effective config) for every registered connector, by priority then name."""
+    overrides = getattr(settings, "INTELLIGENCE_CONNECTORS", {})
+    out = [
+        (name, cls, replace(config, **overrides.get(name, {})))
+        for name, (cls, config) in _CONNECTORS.items()
+    ]
+    return sorted(out, key=lambda item: (item[2].priority, item[0]))
@@ -0,0 +1,222 @@
+"""
+Canonical EntityRelationship edges with multi-source evidence.
+
+Each (from, relationship_type, to) edge is stored once (unique constraint);
+every SourceSystem that asserts it sets its bit in source_mask. confidence is
+the noisy-OR of the asserting sources' confidences, 1 - prod(1 - c_source),
+so an edge seen by two sources is trusted more than one seen by either alone.
+
+Staleness policy (settings.INTELLIGENCE_EDGE_DECAY, all keys optional):
+    window_days     -- edges not confirmed for this long are stale (default 30)
+    factor          -- stale edges' confidence is multiplied by this on every
+                       decay run (default 0.5)
+    expire_days     -- stale edges older than this are deleted (default 90)
+    min_confidence  -- stale edges decayed below this are deleted (default 0.05)
+
+Edges asserted manually never decay; no sync will ever reconfirm them.
+"""
+from __future__ import annotations
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .access import affected_identities, delete_edges, refresh_identities
+from .models import SOURCE_BITS, EntityRelationship, SourceSystem
+
+# (from_entity_type, from_entity_id, relationship_type, to_entity_type, to_entity_id)
+EdgeKey = Tuple[str, uuid.UUID, str, str, uuid.UUID]
+
+SOURCE_CONFIDENCE = {
+    SourceSystem.MANUAL: 1.0,
+    SourceSystem.SERVICENOW: 0.7,
+    SourceSystem.FLEXERA: 0.7,
+    SourceSystem.OTHER: 0.5,
+}
+DEFAULT_CONFIDENCE = 0.8
+
+DECAY_DEFAULTS = {
+    "window_days": 30,
+    "factor": 0.5,
+    "expire_days": 90,
+    "min_confidence": 0.05,
+}
+
+
+def source_confidence(source: str) -> float:
+    overrides = getattr(settings, "INTELLIGENCE_SOURCE_CONFIDENCE", {})
+    return float(overrides.get(source, SOURCE_CONFIDENCE.get(source, DEFAULT_CONFIDENCE)))
+
+
+def aggregate_confidence(mask: int) -> float:
+    """Noisy-OR of the confidences of the sources set in `mask`."""
+    doubt = 1.0
+    for source, bit in SOURCE_BITS.items():
+        if mask & bit:
+            doubt *= 1.0 - source_confidence(source)
+    return 1.0 - doubt
+
+
+def confidence_expression(mask):
+    """aggregate_confidence() as a SQL expression over the mask expression `mask`."""
+    doubt = Value(1.0)
+    for source, bit in SOURCE_BITS.items():
+        is_set = mask.bitand(bit) / Value(bit)  # 0 or 1
+        doubt = doubt * (Value(1.0) - Value(source_confidence(source)) * is_set)
+    return Value(1.0) - doubt
+
+
+def source_mask_expression():
+    """
+    source_mask as a SQL expression, falling back to the bit of `source` for
+    rows written without a mask (fixtures, raw inserts), which would
+    otherwise aggregate to a confidence of 0.
+    """
+    by_source = Case(*(When(source=source, then=Value(bit)) for source, bit in SOURCE_BITS.items()), default=Value(0))
+    return Case(When(source_mask=0, then=by_source), default=F("source_mask"), output_field=PositiveIntegerField())
+
+
+def confirm_edges(edges: QuerySet, source: Optional[str] = None, at=None) -> int:
+    """
+    Mark every edge in `edges` as confirmed at `at` (default now) in a single
+    UPDATE. With `source`, also record it as asserting the edges. Confidence
+    is re-aggregated from the sources either way, which undoes any decay.
+    """
+    at = at or timezone.now()
+    mask = source_mask_expression()
+    if source is not None:
+        mask = mask.bitor(SOURCE_BITS[source])
+    return edges.update(last_confirmed_at=at, source_mask=mask, confidence=confidence_expression(mask))
+
+
+def _existing_ids(keys: Sequence[EdgeKey]) -> Dict[EdgeKey, Any]:
+    """Primary keys of the edges in `keys` that already exist, with one query per (type, rel, type) group."""
+    groups: Dict[Tuple[str, str, str], List[EdgeKey]] = defaultdict(list)
+    for key in keys:
+        groups[(key[0], key[2], key[3])].append(key)
+    found: Dict[EdgeKey, Any] = {}
+    wanted = set(keys)
+    for (from_type, rel, to_type), group in groups.items():
+        # Only the from end goes into the IN list: two IN lists make SQLite probe their cross product.
+        rows = EntityRelationship.objects.filter(
+            from_entity_type=from_type, relationship_type=rel, to_entity_type=to_type,
+            from_entity_id__in={k[1] for k in group},
+        ).values_list("pk", "from_entity_id", "to_entity_id")
+        for pk, from_id, to_id in rows:
+            key = (from_type, from_id, rel, to_type, to_id)
+            if key in wanted:
+                found[key] = pk
+    return found
+
+
+@dataclass
+class AssertResult:
+    created: int = 0
+    confirmed: int = 0
+
+    def __str__(self):
+        return f"{self.created} new edges, {self.confirmed} confirmed"
+
+
+def assert_edges(source: str, edges: Iterable[EdgeKey], at=None, batch_size: int = 1000) -> AssertResult:
+    """
+    Record that `source` asserts `edges`: missing edges are inserted, existing
+    ones (from any source) get the source's bit and are confirmed. Repeated
+    keys are collapsed. A few statements per batch. If another writer inserts
+    the same new edge concurrently, this source's bit is added on its next sync.
+    Finally, EffectiveAccess gains the rows the new edges grant.
+    """
+    at = at or timezone.now()
+    bit = SOURCE_BITS[source]
+    result = AssertResult()
+    batch: Dict[EdgeKey, None] = {}
+    gained: set = set()  # identities whose effective access grows
+
+    def flush():
+        keys = list(batch)
+        batch.clear()
+        with transaction.atomic():
+            existing = _existing_ids(keys)
+            new = [
+                EntityRelationship(
+                    from_entity_type=k[0], from_entity_id=k[1], relationship_type=k[2],
+                    to_entity_type=k[3], to_entity_id=k[4],
+                    source=source, source_mask=bit, confidence=source_confidence(source), last_confirmed_at=at,
+                )
+                for k in keys if k not in existing
+            ]
+            EntityRelationship.objects.bulk_create(new, batch_size=batch_size, ignore_conflicts=True)
+            if existing:
+                confirm_edges(EntityRelationship.objects.filter(pk__in=list(existing.values())), source, at)
+        # Only new edges can grant access; confirming existing ones changes nothing.
+        gained.update(affected_identities(k for k in keys if k not in existing))
+        result.created += len(new)
+        result.confirmed += len(existing)
+
+    for key in edges:
+        batch[key] = None
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    refresh_identities(gained, additions_only=True)
+    return result
+
+
+def decay_policy(**overrides: Any) -> Dict[str, Any]:
+    policy = dict(DECAY_DEFAULTS)
+    policy.update(getattr(settings, "INTELLIGENCE_EDGE_DECAY", {}))
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    return policy
+
+
+@dataclass
+class DecayResult:
+    decayed: int = 0
+    expired: int = 0
+
+    def __str__(self):
+        return f"Decayed {self.decayed} stale edges, expired {self.expired}"
+
+
+def stale_edges(older_than: timedelta, now=None) -> QuerySet:
+    """Non-manual edges last confirmed (or, if never confirmed, created) before now - older_than."""
+    cutoff = (now or timezone.now()) - older_than
+    manual = SOURCE_BITS[SourceSystem.MANUAL]
+    return (
+        EntityRelationship.objects
+        .alias(confirmed=Coalesce("last_confirmed_at", "created_at"), manual=F("source_mask").bitand(manual))
+        .filter(confirmed__lt=cutoff)
+        .exclude(Q(manual=manual) | Q(source_mask=0, source=SourceSystem.MANUAL))
+    )
+
+
+def decay_edges(dry_run: bool = False, **overrides: Any) -> DecayResult:
+    """Apply the staleness policy with one DELETE and one UPDATE."""
+    policy = decay_policy(**overrides)
+    now = timezone.now()
+    stale = stale_edges(timedelta(days=policy["window_days"]), now)
+    expiring = stale.filter(
+        Q(confirmed__lt=now - timedelta(days=policy["expire_days"]))
+        | Q(confidence__lt=policy["min_confidence"] / policy["factor"])
+    )
+    result = DecayResult()
+    if dry_run:
+        result.expired = expiring.count()
+        result.decayed = stale.count() - result.expired
+        return result
+    with transaction.atomic():
+        lost = affected_identities(expiring.values_list(
+            "from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id",
+        ).iterator(chunk_size=5000))
+        result.expired = delete_edges(EntityRelationship.objects.filter(pk__in=expiring.values("pk")))
+        refresh_identities(lost)
+        result.decayed = stale.update(confidence=F("confidence") * policy["factor"])
+    return result
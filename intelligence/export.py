@@ -0,0 +1,250 @@
+"""
+Columnar export of the inventory and relationship graph for offline analysis.
+
+Each table in EXPORT_TABLES is streamed with QuerySet.iterator() (a
+server-side cursor on Postgres) and written chunk by chunk, so memory stays
+at one chunk whatever the table size:
+
+    npz      <table>-<stamp>/part-NNNNN.npz, one compressed file per chunk    (numpy)
+
+UUIDs are exported as 36-byte ASCII strings, datetimes as UTC microsecond
+datetime64 and JSON fields as JSON text; NULL strings become "". Text columns
+are stored offset-encoded, a uint8 UTF-8 buffer `<column>` plus int64
+`<column>.offsets` (row i is buffer[offsets[i]:offsets[i + 1]]), so a part
+costs its total text size rather than rows x its longest value; read_part()
+decodes them. A
+manifest.json in the output directory records the highest updated_at
+exported per table; export(incremental=True) then only writes rows changed
+since. Deletions are not captured incrementally, and group memberships (no
+timestamps) are always exported in full.
+"""
+from __future__ import annotations
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Asset, EntityRelationship, ExternalID, Group, Identity
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see requirements-optional.txt
+    np = None
+
+FORMATS = ("npz",)
+DEFAULT_FORMAT = "npz"
+MANIFEST = "manifest.json"
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    name: str
+    model: Type[models.Model]
+    changed_field: Optional[str] = "updated_at"  # None: no change tracking, always exported in full
+
+    @property
+    def fields(self) -> List[models.Field]:
+        return list(self.model._meta.concrete_fields)
+
+
+EXPORT_TABLES = (
+    ExportTable("relationships", EntityRelationship),
+    ExportTable("assets", Asset),
+    ExportTable("identities", Identity),
+    ExportTable("groups", Group),
+    ExportTable("group_members", Group.members.through, changed_field=None),
+    ExportTable("external_ids", ExternalID),
+)
+
+
+def _kind(f: models.Field) -> str:
+    internal = (f.target_field if f.is_relation else f).get_internal_type()
+    if internal == "UUIDField":
+        return "uuid"
+    if internal == "DateTimeField":
+        return "datetime"
+    if internal == "JSONField":
+        return "json"
+    if internal == "FloatField":
+        return "float"
+    if internal == "BooleanField":
+        return "bool"
+    if internal.endswith("IntegerField") or internal.endswith("AutoField"):
+        return "int"
+    return "str"
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None) if value is not None else None
+
+
+# Python value -> exportable value, per column kind.
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "uuid": lambda v: str(v) if v is not None else None,
+    "datetime": _utc,
+    "json": lambda v: json.dumps(v, sort_keys=True, default=str) if v is not None else None,
+    "float": lambda v: v,
+    "bool": lambda v: v,
+    "int": lambda v: v,
+    "str": lambda v: v,
+}
+
+
+OFFSETS = ".offsets"
+
+
+class _NpzWriter:
+    DTYPES = {"uuid": "S36", "float": "float64", "bool": "bool", "int": "int64", "datetime": "datetime64[us]"}
+    TEXT = ("str", "json")
+
+    def __init__(self, path: Path, columns: Sequence[str], kinds: Sequence[str]):
+        self.dir = path
+        self.columns, self.kinds = list(columns), list(kinds)
+        self.parts: List[Path] = []
+
+    def write(self, columns: Sequence[List[Any]]) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for name, kind, col in zip(self.columns, self.kinds, columns):
+            if kind in self.TEXT:
+                encoded = [b"" if v is None else v.encode() for v in col]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(b) for b in encoded], out=offsets[1:])
+                arrays[name] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+                arrays[name + OFFSETS] = offsets
+                continue
+            if kind == "uuid":
+                col = ["" if v is None else v for v in col]
+            arrays[name] = np.array(col, dtype=self.DTYPES[kind])
+        part = self.dir / f"part-{len(self.parts):05d}.npz"
+        np.savez_compressed(part, **arrays)
+        self.parts.append(part)
+
+    def close(self) -> List[Path]:
+        return self.parts
+
+
+WRITERS = {"npz": _NpzWriter}
+
+
+def read_part(path) -> Dict[str, "np.ndarray"]:
+    """Load one npz part, decoding offset-encoded text columns to object arrays of str."""
+    with np.load(path) as part:
+        arrays = {name: part[name] for name in part.files}
+    for name in [n[:-len(OFFSETS)] for n in arrays if n.endswith(OFFSETS)]:
+        buf, offsets = arrays.pop(name).tobytes(), arrays.pop(name + OFFSETS).tolist()
+        text = np.empty(len(offsets) - 1, dtype=object)
+        text[:] = [buf[a:b].decode() for a, b in zip(offsets, offsets[1:])]
+        arrays[name] = text
+    return arrays
+
+
+@dataclass
+class TableExport:
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    since: Optional[datetime] = None
+    watermark: Optional[datetime] = None
+    files: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ExportResult:
+    tables: Dict[str, TableExport] = field(default_factory=dict)
+
+    def __str__(self):
+        return " ".join(
+            f"{name}={t.rows} rows/{t.bytes / 2**20:.1f}MiB/{t.seconds:.1f}s{' (incremental)' if t.since else ''}"
+            for name, t in self.tables.items()
+        )
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    if fmt == "npz" and np is None:
+        raise ImportError("npz export requires numpy (pip install numpy)")
+
+
+def _read_manifest(out: Path) -> Dict[str, Any]:
+    path = out / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {"tables": {}, "exports": []}
+
+
+def export_table(table: ExportTable, path: Path, fmt: str, since: Optional[datetime] = None,
+                 chunk_size: int = 50000) -> TableExport:
+    """Stream one table to `path` (suffix added by the writer). Returns rows written and the new watermark."""
+    started = time.perf_counter()
+    fields = table.fields
+    columns = [f.attname for f in fields]
+    kinds = [_kind(f) for f in fields]
+    convert = [CONVERTERS[k] for k in kinds]
+    changed = columns.index(table.changed_field) if table.changed_field else None
+
+    qs = table.model.objects.all()
+    if since is not None and table.changed_field:
+        qs = qs.filter(**{f"{table.changed_field}__gt": since})
+    writer = WRITERS[fmt](path, columns, kinds)
+    result = TableExport(since=since)
+    watermark = since
+    chunk: List[tuple] = []
+
+    def flush():
+        writer.write([[c(v) for v in col] for c, col in zip(convert, zip(*chunk))])
+        result.rows += len(chunk)
+        chunk.clear()
+
+    for row in qs.values_list(*columns).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if changed is not None and (watermark is None or row[changed] > watermark):
+            watermark = row[changed]
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    files = writer.close()
+    result.files = [str(p) for p in files]
+    result.bytes = sum(p.stat().st_size for p in files)
+    result.seconds = time.perf_counter() - started
+    result.watermark = watermark
+    return result
+
+
+def export(out: str, fmt: str = DEFAULT_FORMAT, tables: Optional[Sequence[str]] = None, incremental: bool = False,
+           chunk_size: int = 50000) -> ExportResult:
+    """
+    Export `tables` (default: all of EXPORT_TABLES) into directory `out` and
+    update its manifest. With `incremental`, tables exported before only get
+    rows whose updated_at is past the manifest's watermark.
+    """
+    _check_format(fmt)
+    out_dir = Path(out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    stamp = timezone.now().strftime("%Y%m%dT%H%M%S%f")  # two runs in one second must not share files
+    result = ExportResult()
+    for table in EXPORT_TABLES:
+        if tables and table.name not in tables:
+            continue
+        state = manifest["tables"].get(table.name, {})
+        since = parse_datetime(state["watermark"]) if incremental and state.get("watermark") else None
+        done = export_table(table, out_dir / f"{table.name}-{stamp}", fmt, since=since, chunk_size=chunk_size)
+        result.tables[table.name] = done
+        if done.watermark is not None:
+            state["watermark"] = done.watermark.isoformat()
+        manifest["tables"][table.name] = state
+    manifest["exports"].append({
+        "at": stamp, "format": fmt, "incremental": incremental,
+        "tables": {name: {"rows": t.rows, "files": [Path(f).name for f in t.files],
+                          "since": t.since.isoformat() if t.since else None}
+                   for name, t in result.tables.items()},
+    })
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return result
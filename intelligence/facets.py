@@ -0,0 +1,135 @@
+"""
+Faceted filters for list views.
+
+?type=server&type=database&criticality=tier0 keeps rows matching any value
+within a facet and every facet selected. Counts are disjunctive: each facet's
+counts ignore that facet's own selection, so picking "server" still shows
+how many databases there are. All facets are counted in one statement:
+
+    SELECT 'type', type, COUNT(*) FROM asset WHERE <other facets> GROUP BY type
+    UNION ALL
+    SELECT 'criticality', criticality, COUNT(*) FROM asset WHERE <other facets> GROUP BY criticality
+    ...
+
+each branch served by a covering index (see the Asset and Identity indexes),
+so the result has one row per facet value rather than one per combination
+of values. Counts are cached for
+settings.INTELLIGENCE_FACET_CACHE_SECONDS (default 60) per filter combination.
+"""
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Cast
+from django.http import QueryDict
+
+
+@dataclass(frozen=True)
+class Facet:
+    field: str
+    label: str
+    limit: int = 20  # most frequent values shown
+
+
+@dataclass
+class FacetValue:
+    value: str
+    label: str
+    count: int
+    selected: bool
+    query: str = ""  # querystring toggling this value
+
+
+@dataclass
+class FacetResult:
+    facet: Facet
+    values: List[FacetValue] = field(default_factory=list)
+
+
+def selected_values(model: type, facets: Sequence[Facet], params: QueryDict) -> Dict[str, List[str]]:
+    """Valid selected values per facet field; unknown choices and malformed ids are dropped."""
+    selected = {}
+    for facet in facets:
+        f = model._meta.get_field(facet.field)
+        target = f.target_field if f.is_relation else f
+        values = []
+        for raw in params.getlist(facet.field):
+            if f.choices and raw not in dict(f.choices):
+                continue
+            try:
+                values.append(str(target.to_python(raw)))
+            except ValidationError:
+                continue
+        if values:
+            selected[facet.field] = values
+    return selected
+
+
+def _matches(selected: Dict[str, List[str]], skip: Optional[str] = None) -> Q:
+    q = Q()
+    for name, values in selected.items():
+        if name != skip:
+            q &= Q(**{f"{name}__in": values})
+    return q
+
+
+def apply(qs: models.QuerySet, selected: Dict[str, List[str]]) -> models.QuerySet:
+    return qs.filter(_matches(selected)) if selected else qs
+
+
+def _counts(qs: models.QuerySet, facets: Sequence[Facet], selected: Dict[str, List[str]]) -> Dict[str, Dict[str, int]]:
+    parts = []
+    for facet in facets:
+        f = qs.model._meta.get_field(facet.field)
+        # UNION needs one column type; foreign keys (UUIDs) are compared as text.
+        value = Cast(f.attname, models.CharField()) if f.is_relation else F(f.attname)
+        parts.append(qs.filter(_matches(selected, skip=facet.field)).order_by()
+                     .values(facet_name=Value(facet.field), facet_value=value).annotate(n=Count("*")))
+    counts: Dict[str, Dict[str, int]] = {facet.field: {} for facet in facets}
+    for row in parts[0].union(*parts[1:], all=True):
+        if row["facet_value"] is not None:
+            f = qs.model._meta.get_field(row["facet_name"])
+            value = (f.target_field if f.is_relation else f).to_python(row["facet_value"])
+            counts[row["facet_name"]][str(value)] = row["n"]
+    return counts
+
+
+def facet_counts(qs: models.QuerySet, facets: Sequence[Facet], selected: Dict[str, List[str]],
+                 params: QueryDict) -> List[FacetResult]:
+    """Per-facet value counts for `qs` (the list's queryset before facet filtering)."""
+    ttl = getattr(settings, "INTELLIGENCE_FACET_CACHE_SECONDS", 60)
+    sql, sql_params = qs.order_by().query.sql_with_params()
+    raw = repr((sql, sql_params, [f.field for f in facets], sorted(selected.items())))
+    key = "intelligence:facets:" + hashlib.sha1(raw.encode()).hexdigest()
+    counts = cache.get(key)
+    if counts is None:
+        counts = _counts(qs, facets, selected)
+        cache.set(key, counts, ttl)
+
+    results = []
+    for facet in facets:
+        f = qs.model._meta.get_field(facet.field)
+        chosen = selected.get(facet.field, [])
+        top = sorted(counts[facet.field].items(), key=lambda kv: (-kv[1], kv[0]))[:facet.limit]
+        shown = dict(top)
+        for value in chosen:  # selected values stay visible (and deselectable) even with no rows
+            shown.setdefault(value, counts[facet.field].get(value, 0))
+        if f.is_relation:
+            labels = {str(pk): str(obj) for pk, obj in f.related_model.objects.in_bulk(list(shown)).items()}
+        else:
+            labels = {str(k): str(v) for k, v in (f.flatchoices or ())}
+        result = FacetResult(facet)
+        for value, count in shown.items():
+            query = params.copy()
+            query.pop("page", None)
+            query.pop("cursor", None)
+            query.setlist(facet.field, [v for v in chosen if v != value] if value in chosen else chosen + [value])
+            result.values.append(FacetValue(value, labels.get(value, value), count, value in chosen, query.urlencode()))
+        results.append(result)
+    return results
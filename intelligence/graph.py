@@ -0,0 +1,133 @@
+"""
+Traversals over the EntityRelationship graph.
+
+blast_radius() answers "what is reachable from this entity within N hops",
+following edges forwards ("out"), backwards ("in", e.g. everything that
+DEPENDS_ON an asset) or both. On SQLite/Postgres it runs as a single
+recursive CTE; elsewhere it walks the graph one frontier at a time, with one
+indexed query per hop. method="index" answers from the in-memory
+graph_index.AdjacencyIndex instead (needs numpy; may lag recent writes).
+"""
+from __future__ import annotations
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.db import connection
+
+from .models import EntityRelationship
+
+Node = Tuple[str, uuid.UUID]
+
+DIRECTIONS = ("out", "in", "both")
+CTE_VENDORS = ("postgresql", "sqlite")
+
+
+@dataclass(frozen=True)
+class Reached:
+    entity_type: str
+    entity_id: uuid.UUID
+    depth: int
+
+
+def _uuid_field():
+    return EntityRelationship._meta.get_field("from_entity_id")
+
+
+def _blast_radius_cte(start: Node, direction: str, max_depth: int,
+                      relationship_types: Optional[Sequence[str]], limit: int) -> List[Reached]:
+    field = _uuid_field()
+    table = connection.ops.quote_name(EntityRelationship._meta.db_table)
+    out_match = "e.from_entity_type = w.entity_type AND e.from_entity_id = w.entity_id"
+    in_match = "e.to_entity_type = w.entity_type AND e.to_entity_id = w.entity_id"
+    join = {"out": out_match, "in": in_match, "both": f"({out_match}) OR ({in_match})"}[direction]
+    # For "both", step to whichever end of the edge we didn't come from.
+    if direction == "out":
+        next_type, next_id = "e.to_entity_type", "e.to_entity_id"
+    elif direction == "in":
+        next_type, next_id = "e.from_entity_type", "e.from_entity_id"
+    else:
+        next_type = f"CASE WHEN {out_match} THEN e.to_entity_type ELSE e.from_entity_type END"
+        next_id = f"CASE WHEN {out_match} THEN e.to_entity_id ELSE e.from_entity_id END"
+
+    params: List[object] = [start[0], field.get_db_prep_value(start[1], connection), max_depth]
+    type_filter = ""
+    if relationship_types:
+        type_filter = f" AND e.relationship_type IN ({', '.join(['%s'] * len(relationship_types))})"
+        params += list(relationship_types)
+    # UNION (not UNION ALL) drops repeated (node, depth) rows, which bounds cycles.
+    sql = f"""
+        WITH RECURSIVE walk(entity_type, entity_id, depth) AS (
+            SELECT CAST(%s AS VARCHAR(64)), %s, 0
+            UNION
+            SELECT CAST({next_type} AS VARCHAR(64)), {next_id}, w.depth + 1
+            FROM walk w JOIN {table} e ON {join}
+            WHERE w.depth < %s{type_filter}
+        )
+        SELECT entity_type, entity_id, MIN(depth) AS depth
+        FROM walk
+        GROUP BY entity_type, entity_id
+        HAVING MIN(depth) > 0
+        ORDER BY depth
+        LIMIT %s
+    """
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [Reached(t, field.to_python(i), d) for t, i, d in cursor.fetchall()]
+
+
+def _blast_radius_python(start: Node, direction: str, max_depth: int,
+                         relationship_types: Optional[Sequence[str]], limit: int) -> List[Reached]:
+    seen: Set[Node] = {start}
+    frontier: List[Node] = [start]
+    reached: List[Reached] = []
+    for depth in range(1, max_depth + 1):
+        if not frontier or len(reached) >= limit:
+            break
+        by_type: Dict[str, List[uuid.UUID]] = defaultdict(list)
+        for t, i in frontier:
+            by_type[t].append(i)
+        frontier = []
+        for nxt in _neighbors(by_type, direction, relationship_types):
+            if nxt not in seen:
+                seen.add(nxt)
+                frontier.append(nxt)
+                reached.append(Reached(nxt[0], nxt[1], depth))
+    return reached[:limit]
+
+
+def _neighbors(by_type: Dict[str, List[uuid.UUID]], direction: str,
+               relationship_types: Optional[Sequence[str]], chunk: int = 1000) -> Iterable[Node]:
+    """Neighbours of a frontier: one query per direction and per `chunk` ids of each type."""
+    qs = EntityRelationship.objects.all()
+    if relationship_types:
+        qs = qs.filter(relationship_type__in=relationship_types)
+    for etype, ids in by_type.items():
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            if direction in ("out", "both"):
+                yield from qs.filter(from_entity_type=etype, from_entity_id__in=part).values_list("to_entity_type", "to_entity_id")
+            if direction in ("in", "both"):
+                yield from qs.filter(to_entity_type=etype, to_entity_id__in=part).values_list("from_entity_type", "from_entity_id")
+
+
+def blast_radius(entity_type: str, entity_id: uuid.UUID, direction: str = "both", max_depth: int = 3,
+                 relationship_types: Optional[Sequence[str]] = None, limit: int = 10000,
+                 method: str = "auto") -> List[Reached]:
+    """
+    Entities reachable from (entity_type, entity_id) within max_depth hops,
+    each at its shortest hop distance, nearest first. The start node is excluded.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}")
+    start = (entity_type, entity_id)
+    if method == "auto":
+        method = "cte" if connection.vendor in CTE_VENDORS else "python"
+    if method == "index":
+        from .graph_index import get_index
+        return get_index().k_hop(entity_id, max_depth, direction, relationship_types, limit)
+    if method == "cte":
+        return _blast_radius_cte(start, direction, max_depth, relationship_types, limit)
+    return _blast_radius_python(start, direction, max_depth, relationship_types, limit)
@@ -0,0 +1,352 @@
+"""
+Process-level compact adjacency index over EntityRelationship, for interactive
+graph exploration without a query per hop.
+
+Entity UUIDs are interned to int32 node ids; edges (endpoints, type,
+confidence) live in NumPy arrays and are indexed per relationship type as CSR (offset/neighbour) arrays in both
+directions, i.e. a few tens of bytes per edge instead of a model instance
+per row. The index is built in one streaming pass and refreshed from
+updated_at; deletions are only picked up by a full rebuild (see max_age in
+get_index()). An index is never modified once published: a refresh with
+changes builds a new one (merging only the changed rows) and get_index()
+swaps it in.
+
+Requires NumPy (pip install numpy).
+"""
+from __future__ import annotations
+import threading
+import time
+import uuid
+from array import array
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .graph import DIRECTIONS, Reached
+from .models import EntityRelationship, EntityType, RelationshipType
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see requirements-optional.txt
+    np = None
+
+ENTITY_TYPE_CODES = {t: i for i, t in enumerate(EntityType.values)}
+REL_TYPE_CODES = {t: i for i, t in enumerate(RelationshipType.values)}
+
+
+class AdjacencyIndex:
+    def __init__(self):
+        if np is None:
+            raise ImportError("AdjacencyIndex requires numpy (pip install numpy)")
+        self._node_of: Dict[bytes, int] = {}
+        self._node_uuid = bytearray()  # 16 bytes per node, in node-id order
+        self._node_type = array("B")
+        self._src = np.empty(0, dtype=np.int32)
+        self._dst = np.empty(0, dtype=np.int32)
+        self._rel = np.empty(0, dtype=np.uint8)
+        self._conf = np.empty(0, dtype=np.float32)
+        # rel code -> (offsets, neighbours, edge indexes) for each direction
+        self._out: Dict[int, Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = {}
+        self._in: Dict[int, Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = {}
+        # Structures derived from the edge arrays by callers (see paths.py); per index, so never stale.
+        self.derived: Dict[tuple, object] = {}
+        self.generation = uuid.uuid4().hex[:8]
+        self.watermark = None  # max updated_at loaded so far
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+
+    # ---- building ----
+
+    @classmethod
+    def build(cls, chunk_size: int = 20000) -> "AdjacencyIndex":
+        index = cls()
+        index.built_at = time.monotonic()
+        index._src, index._dst, index._rel, index._conf = index._read(
+            cls._rows(EntityRelationship.objects.all(), chunk_size))
+        index._dedupe()
+        index._index()
+        return index
+
+    def refreshed(self, chunk_size: int = 20000) -> "AdjacencyIndex":
+        """
+        This index with the edges created/updated since its watermark merged
+        in. With no such edges it is returned as is (derived structures
+        included). Otherwise a new index is returned and this one is left as it
+        was, so callers still holding it never see half-built tables. Only the
+        changed rows are read and sorted; the rest is linear array copying.
+        """
+        qs = EntityRelationship.objects.all()
+        if self.watermark is not None:
+            qs = qs.filter(updated_at__gt=self.watermark)
+        rows = self._rows(qs, chunk_size)
+        first = next(rows, None)
+        if first is None:
+            return self
+        index = self._copy()
+        index._merge(*index._read(chain([first], rows)))
+        return index
+
+    def _copy(self) -> "AdjacencyIndex":
+        # Edge arrays and CSR tables are only ever replaced, never written in place, so they can be shared.
+        index = type(self)()
+        index._node_of = dict(self._node_of)
+        index._node_uuid = bytearray(self._node_uuid)
+        index._node_type = array("B", self._node_type)
+        index._src, index._dst, index._rel, index._conf = self._src, self._dst, self._rel, self._conf
+        index._out, index._in = dict(self._out), dict(self._in)
+        index.generation, index.watermark, index.built_at = self.generation, self.watermark, self.built_at
+        return index
+
+    def _intern(self, entity_type: str, entity_id: uuid.UUID) -> int:
+        key = entity_id.bytes
+        node = self._node_of.get(key)
+        if node is None:
+            node = self._node_of[key] = len(self._node_type)
+            self._node_uuid += key
+            self._node_type.append(ENTITY_TYPE_CODES[entity_type])
+        return node
+
+    @staticmethod
+    def _rows(qs, chunk_size: int) -> Iterator[tuple]:
+        return qs.values_list(
+            "from_entity_type", "from_entity_id", "to_entity_type", "to_entity_id",
+            "relationship_type", "confidence", "updated_at",
+        ).iterator(chunk_size=chunk_size)
+
+    def _read(self, rows: Iterable[tuple]):
+        """(src, dst, rel, conf) arrays of `rows`, interning their endpoints and advancing the watermark."""
+        src, dst, rel, conf = array("i"), array("i"), array("B"), array("f")
+        watermark = self.watermark
+        for from_type, from_id, to_type, to_id, rel_type, confidence, updated_at in rows:
+            src.append(self._intern(from_type, from_id))
+            dst.append(self._intern(to_type, to_id))
+            rel.append(REL_TYPE_CODES.get(rel_type, REL_TYPE_CODES[RelationshipType.OTHER]))
+            conf.append(confidence)
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+        self.watermark = watermark
+        return (np.frombuffer(src, dtype=np.int32), np.frombuffer(dst, dtype=np.int32),
+                np.frombuffer(rel, dtype=np.uint8), np.frombuffer(conf, dtype=np.float32))
+
+    def _merge(self, src, dst, rel, conf) -> None:
+        """
+        Fold changed edges into the arrays and CSR tables. Edges already
+        indexed keep their position and only get the new confidence; new ones
+        are appended and inserted into their CSR segments.
+        """
+        src, dst, rel, conf = self._unique(src, dst, rel, conf)
+        n = self.node_count
+        self._conf = self._conf.copy()
+        fresh = np.ones(len(src), dtype=bool)
+        for code in np.unique(rel):
+            table = self._out.get(int(code))
+            if table is None:
+                continue
+            mine = np.flatnonzero(rel == code)
+            new_keys = (src[mine].astype(np.int64) << 32) | dst[mine]
+            order = np.argsort(new_keys)
+            sorted_keys = new_keys[order]
+            edges = table[2]
+            old_keys = (self._src[edges].astype(np.int64) << 32) | self._dst[edges]
+            pos = np.searchsorted(sorted_keys, old_keys).clip(max=len(sorted_keys) - 1)
+            hit = sorted_keys[pos] == old_keys
+            matched = mine[order[pos[hit]]]
+            self._conf[edges[hit]] = conf[matched]
+            fresh[matched] = False
+
+        added = np.flatnonzero(fresh)
+        first = self.edge_count
+        self._src = np.concatenate([self._src, src[added]])
+        self._dst = np.concatenate([self._dst, dst[added]])
+        self._rel = np.concatenate([self._rel, rel[added]])
+        self._conf = np.concatenate([self._conf, conf[added]])
+        new_edges = np.arange(first, first + len(added))
+        for side, keys, values in ((self._out, src, dst), (self._in, dst, src)):
+            for code, (offsets, nbrs, edge_ids) in side.items():
+                if len(offsets) < n + 1:  # new nodes: empty segments at the end
+                    offsets = np.concatenate([offsets, np.full(n + 1 - len(offsets), offsets[-1])])
+                    side[code] = (offsets, nbrs, edge_ids)
+            for code in np.unique(rel[added]):
+                mine = added[rel[added] == code]
+                edges = new_edges[rel[added] == code]
+                if int(code) in side:
+                    side[int(code)] = self._csr_insert(side[int(code)], keys[mine], values[mine], edges, n)
+                else:
+                    side[int(code)] = self._csr(keys[mine], values[mine], edges, n)
+
+    @staticmethod
+    def _unique(src, dst, rel, conf):
+        # Several changed copies of one edge in a batch: the last row read wins.
+        key = np.stack([src, dst, rel.astype(np.int32)], axis=1)[::-1]
+        _, keep = np.unique(key, axis=0, return_index=True)
+        if len(keep) == len(key):
+            return src, dst, rel, conf
+        keep = np.sort(len(key) - 1 - keep)
+        return src[keep], dst[keep], rel[keep], conf[keep]
+
+    @classmethod
+    def from_arrays(cls, node_types: Sequence[str], src, dst, relationship_types: Sequence[str],
+                    confidence=None, node_ids: Optional[Sequence[uuid.UUID]] = None) -> "AdjacencyIndex":
+        """Index over an in-memory edge list (node ids are positions in node_types), for tests and benchmarks."""
+        index = cls()
+        node_ids = node_ids if node_ids is not None else [uuid.uuid4() for _ in node_types]
+        for entity_type, entity_id in zip(node_types, node_ids):
+            index._intern(entity_type, entity_id)
+        index._src = np.asarray(src, dtype=np.int32)
+        index._dst = np.asarray(dst, dtype=np.int32)
+        if isinstance(relationship_types, np.ndarray):  # already REL_TYPE_CODES
+            index._rel = relationship_types.astype(np.uint8)
+        else:
+            index._rel = np.array([REL_TYPE_CODES[t] for t in relationship_types], dtype=np.uint8)
+        index._conf = np.ones(len(index._src), dtype=np.float32) if confidence is None else np.asarray(confidence, dtype=np.float32)
+        index._dedupe()
+        index._index()
+        return index
+
+    def _dedupe(self) -> None:
+        # Re-confirmed or re-sourced edges must not show up twice; the newest copy wins.
+        self._src, self._dst, self._rel, self._conf = self._unique(self._src, self._dst, self._rel, self._conf)
+
+    def _index(self) -> None:
+        n = self.node_count
+        self._out, self._in = {}, {}
+        self.derived = {}
+        for code in np.unique(self._rel):
+            edges = np.flatnonzero(self._rel == code)
+            src, dst = self._src[edges], self._dst[edges]
+            self._out[int(code)] = self._csr(src, dst, edges, n)
+            self._in[int(code)] = self._csr(dst, src, edges, n)
+
+    @staticmethod
+    def _csr(keys: "np.ndarray", values: "np.ndarray", edges: "np.ndarray", n: int):
+        order = np.argsort(keys, kind="stable")
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n), out=offsets[1:])
+        return offsets, values[order].astype(np.int32), edges[order].astype(np.int32)
+
+    @staticmethod
+    def _csr_insert(table, keys: "np.ndarray", values: "np.ndarray", edges: "np.ndarray", n: int):
+        """`table` with edges added at the end of their keys' segments, as _csr() would have placed them."""
+        offsets, nbrs, edge_ids = table
+        order = np.argsort(keys, kind="stable")
+        at = offsets[keys[order] + 1]
+        shift = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n), out=shift[1:])
+        return (offsets + shift, np.insert(nbrs, at, values[order]).astype(np.int32),
+                np.insert(edge_ids, at, edges[order]).astype(np.int32))
+
+    # ---- queries ----
+
+    @property
+    def node_count(self) -> int:
+        return len(self._node_type)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._src)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever the indexed graph does; used as a cache key."""
+        return f"{self.generation}:{self.edge_count}:{self.watermark.isoformat() if self.watermark else '-'}"
+
+    def memory_bytes(self) -> int:
+        arrays = [self._src, self._dst, self._rel, self._conf]
+        for csr in (self._out, self._in):
+            for table in csr.values():
+                arrays += list(table)
+        return sum(a.nbytes for a in arrays) + len(self._node_uuid) + len(self._node_type)
+
+    def node_id(self, entity_id: uuid.UUID) -> Optional[int]:
+        return self._node_of.get(entity_id.bytes)
+
+    def node(self, node: int) -> Tuple[str, uuid.UUID]:
+        raw = bytes(self._node_uuid[node * 16:(node + 1) * 16])
+        return EntityType.values[self._node_type[node]], uuid.UUID(bytes=raw)
+
+    def _tables(self, direction: str, relationship_types: Optional[Sequence[str]]):
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        codes = None if not relationship_types else {REL_TYPE_CODES[t] for t in relationship_types}
+        sides = [self._out] if direction == "out" else [self._in] if direction == "in" else [self._out, self._in]
+        return [csr for side in sides for code, csr in side.items() if codes is None or code in codes]
+
+    @staticmethod
+    def _expand(tables, frontier: "np.ndarray") -> "np.ndarray":
+        parts = []
+        for offsets, nbrs, _ in tables:
+            starts, ends = offsets[frontier], offsets[frontier + 1]
+            lengths = ends - starts
+            total = int(lengths.sum())
+            if not total:
+                continue
+            # Gather nbrs[start:end] for every frontier node without a Python loop.
+            shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            parts.append(nbrs[np.arange(total) + shift])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+
+    def neighbors(self, entity_id: uuid.UUID, direction: str = "out",
+                  relationship_types: Optional[Sequence[str]] = None) -> List[Tuple[str, uuid.UUID]]:
+        node = self.node_id(entity_id)
+        if node is None:
+            return []
+        found = np.unique(self._expand(self._tables(direction, relationship_types), np.array([node])))
+        return [self.node(int(n)) for n in found]
+
+    def k_hop(self, entity_id: uuid.UUID, k: int, direction: str = "both",
+              relationship_types: Optional[Sequence[str]] = None, limit: int = 10000) -> List[Reached]:
+        """Same contract as graph.blast_radius(), answered from memory."""
+        start = self.node_id(entity_id)
+        if start is None:
+            return []
+        tables = self._tables(direction, relationship_types)
+        seen = np.zeros(self.node_count, dtype=bool)
+        seen[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        reached: List[Reached] = []
+        for depth in range(1, k + 1):
+            nxt = np.unique(self._expand(tables, frontier))
+            nxt = nxt[~seen[nxt]]
+            if not len(nxt):
+                break
+            seen[nxt] = True
+            for n in nxt[: max(0, limit - len(reached))]:
+                entity_type, entity_uuid = self.node(int(n))
+                reached.append(Reached(entity_type, entity_uuid, depth))
+            if len(reached) >= limit:
+                break
+            frontier = nxt.astype(np.int64)
+        return reached
+
+
+_index: Optional[AdjacencyIndex] = None
+_refreshing = False  # a thread is building the next index outside the lock
+_lock = threading.Lock()
+
+
+def get_index(refresh_after: float = 60.0, max_age: float = 3600.0) -> AdjacencyIndex:
+    """
+    Shared per-process index: built on first use, refreshed (only changed
+    rows are read) when older than `refresh_after` seconds, rebuilt from
+    scratch after `max_age`. One caller refreshes or rebuilds outside the lock
+    while the others keep using the current index; callers keep whichever
+    index they were handed, which is never changed under them.
+    """
+    global _index, _refreshing
+    with _lock:
+        current, now = _index, time.monotonic()
+        if current is None:  # nothing to serve meanwhile: build under the lock
+            _index = AdjacencyIndex.build()
+            _index.refreshed_at = now
+            return _index
+        rebuild = now - current.built_at > max_age
+        if _refreshing or not (rebuild or now - current.refreshed_at > refresh_after):
+            return current
+        _refreshing = True
+    try:
+        index = AdjacencyIndex.build() if rebuild else current.refreshed()
+        index.refreshed_at = now
+        with _lock:
+            _index = index
+    finally:
+        _refreshing = False
+    return index
@@ -0,0 +1,161 @@
+"""
+Closure tables for the Team and Environment trees.
+
+TeamClosure/EnvironmentClosure hold one row per (ancestor, descendant) pair,
+so "this team and all its sub-teams" is a single indexed lookup:
+
+    Asset.objects.filter(owner_team__in=subtree(Team, team_id))
+
+Rows are kept current by post_save/pre_delete signals (see signals.py) and
+by the normalization engine after bulk upserts, which bypass signals. Team
+and Environment reject parents that would create a cycle in clean(); a
+pre_save check repeats it for saves that skip validation.
+rebuild() recomputes a whole table from the parent pointers
+(manage.py rebuild_closures).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+from .models import Environment, EnvironmentClosure, Team, TeamClosure
+
+
+@dataclass(frozen=True)
+class Hierarchy:
+    model: Type[models.Model]
+    closure: Type[models.Model]
+    parent_field: str
+
+    @property
+    def parent_attname(self) -> str:
+        return self.model._meta.get_field(self.parent_field).attname
+
+
+HIERARCHIES: Dict[Type[models.Model], Hierarchy] = {
+    Team: Hierarchy(Team, TeamClosure, "parent_team"),
+    Environment: Hierarchy(Environment, EnvironmentClosure, "parent_environment"),
+}
+
+
+def subtree(model: Type[models.Model], pk: Any, include_self: bool = True) -> models.QuerySet:
+    """Ids of `pk` and everything below it, as a subquery-ready values() queryset."""
+    qs = HIERARCHIES[model].closure.objects.filter(ancestor_id=pk)
+    if not include_self:
+        qs = qs.filter(depth__gt=0)
+    return qs.values("descendant_id")
+
+
+def descendants(obj: models.Model) -> models.QuerySet:
+    """Strict descendants of `obj`, nearest first."""
+    h = HIERARCHIES[type(obj)]
+    return (
+        h.model.objects.filter(ancestor_links__ancestor=obj, ancestor_links__depth__gt=0)
+        .order_by("ancestor_links__depth", "name")
+    )
+
+
+def ancestors(obj: models.Model) -> models.QuerySet:
+    """Strict ancestors of `obj`, root first."""
+    h = HIERARCHIES[type(obj)]
+    return h.model.objects.filter(descendant_links__descendant=obj, descendant_links__depth__gt=0).order_by("-descendant_links__depth")
+
+
+def rebuild(model: Type[models.Model], batch_size: int = 5000) -> int:
+    """Recompute the whole closure table of `model` from its parent pointers. Returns rows written."""
+    h = HIERARCHIES[model]
+    parents = dict(h.model.objects.values_list("pk", h.parent_attname))
+    rows: List[models.Model] = []
+    for pk in parents:
+        node, depth, seen = pk, 0, set()
+        while node is not None and node not in seen:  # a cycle stops at the repeat
+            seen.add(node)
+            rows.append(h.closure(ancestor_id=node, descendant_id=pk, depth=depth))
+            node, depth = parents.get(node), depth + 1
+    with transaction.atomic():
+        h.closure.objects.all().delete()
+        h.closure.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def check_parent(model: Type[models.Model], pk: Any, parent_id: Optional[Any]) -> None:
+    """
+    Raise ValidationError (on the parent field) if making `parent_id` the
+    parent of `pk` would create a cycle. Called from the models' clean(), so
+    forms and the admin show it as a field error.
+    """
+    if parent_id is None or pk is None:
+        return
+    h = HIERARCHIES[model]
+    if parent_id == pk or h.closure.objects.filter(ancestor_id=pk, descendant_id=parent_id).exists():
+        raise ValidationError(
+            {h.parent_field: f"{model._meta.verbose_name.capitalize()} {parent_id} is inside the subtree of {pk}"},
+            code="cycle",
+        )
+
+
+def sync_node(model: Type[models.Model], pk: Any, parent_id: Optional[Any]) -> None:
+    """
+    Attach node `pk` (with its whole subtree) under `parent_id`: drop the links
+    from its old ancestors, then link the new parent's ancestors to every node
+    of the subtree. Handles new nodes, moves and becoming a root.
+    """
+    h = HIERARCHIES[model]
+    links = h.closure.objects
+    with transaction.atomic():
+        below = dict(links.filter(ancestor_id=pk).values_list("descendant_id", "depth"))
+        if not below:
+            links.create(ancestor_id=pk, descendant_id=pk, depth=0)
+            below = {pk: 0}
+        if parent_id in below:
+            check_parent(model, pk, parent_id)
+        links.filter(descendant_id__in=list(below)).exclude(ancestor_id__in=list(below)).delete()
+        if parent_id is None:
+            return
+        above = links.filter(descendant_id=parent_id).values_list("ancestor_id", "depth")
+        links.bulk_create([
+            h.closure(ancestor_id=a, descendant_id=d, depth=a_depth + 1 + d_depth)
+            for a, a_depth in above
+            for d, d_depth in below.items()
+        ])
+
+
+def sync_nodes(model: Type[models.Model], pks: Iterable[Any]) -> int:
+    """
+    Bring the closure rows of `pks` in line with their current parents, e.g.
+    after a bulk upsert. Parents are synced before children. Returns nodes moved.
+    """
+    h = HIERARCHIES[model]
+    pks = list(pks)
+    parents = dict(h.model.objects.filter(pk__in=pks).values_list("pk", h.parent_attname))
+    linked = set(h.closure.objects.filter(descendant_id__in=pks, depth=0).values_list("descendant_id", flat=True))
+    recorded = dict(h.closure.objects.filter(descendant_id__in=pks, depth=1).values_list("descendant_id", "ancestor_id"))
+    changed = {pk: parent for pk, parent in parents.items() if pk not in linked or recorded.get(pk) != parent}
+
+    done: set = set()
+
+    def visit(pk, path=()):
+        if pk in done or pk in path:
+            return
+        parent = changed[pk]
+        if parent in changed:
+            visit(parent, path + (pk,))
+        sync_node(model, pk, parent)
+        done.add(pk)
+
+    for pk in changed:
+        visit(pk)
+    return len(done)
+
+
+def detach_subtree(model: Type[models.Model], pk: Any) -> None:
+    """
+    Before deleting `pk`: its children become roots (parent FK is SET_NULL),
+    so cut every link from `pk` and its ancestors into its strict descendants.
+    """
+    links = HIERARCHIES[model].closure.objects
+    below = links.filter(ancestor_id=pk, depth__gt=0).values("descendant_id")
+    above = links.filter(descendant_id=pk).values("ancestor_id")
+    links.filter(descendant_id__in=below, ancestor_id__in=above).delete()
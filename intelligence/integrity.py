@@ -0,0 +1,127 @@
+"""
+Orphaned polymorphic references.
+
+EntityRelationship endpoints, ExternalIDs and SearchEntries name their
+entity as (EntityType, UUID) with no foreign key, so deleting an asset or
+identity can leave dangling rows behind. scan() counts them with one
+anti-join per reference and EntityType:
+
+    SELECT ... FROM intelligence_entityrelationship r
+    WHERE r.to_entity_type = 'asset'
+      AND NOT EXISTS (SELECT 1 FROM intelligence_asset a WHERE a.id = r.to_entity_id)
+
+plus rows whose type is not a known EntityType at all. delete_orphans()
+removes them in bounded, keyset-paged batches (one transaction each), and
+refreshes the effective access of principals that assumed a deleted identity.
+manage.py check_integrity records both as an IntegrityScan.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Type
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .access import affected_identities, delete_edges, refresh_identities
+from .models import ENTITY_MODELS, EntityRelationship, EntityType, ExternalID, IntegrityScan, SearchEntry
+
+UNKNOWN = "unknown"  # stored entity type that is not an EntityType
+
+
+@dataclass(frozen=True)
+class Reference:
+    model: Type[models.Model]
+    type_field: str
+    id_field: str
+    label: str
+
+
+REFERENCES = (
+    Reference(EntityRelationship, "from_entity_type", "from_entity_id", "relationship.from"),
+    Reference(EntityRelationship, "to_entity_type", "to_entity_id", "relationship.to"),
+    Reference(ExternalID, "entity_type", "entity_uuid", "external_id"),
+    Reference(SearchEntry, "entity_type", "entity_id", "search_entry"),
+)
+
+
+def orphans(ref: Reference, entity_type: str) -> models.QuerySet:
+    """Rows of `ref` pointing at a missing entity of `entity_type` (or at an unknown type)."""
+    qs = ref.model.objects.all()
+    if entity_type == UNKNOWN:
+        return qs.exclude(**{f"{ref.type_field}__in": list(ENTITY_MODELS)})
+    target = ENTITY_MODELS[entity_type].objects.filter(pk=OuterRef(ref.id_field))
+    return qs.filter(**{ref.type_field: entity_type}).filter(~Exists(target))
+
+
+@dataclass
+class IntegrityReport:
+    orphans: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    deleted: int = 0
+
+    @property
+    def total(self) -> int:
+        """Dangling references; an edge missing both endpoints counts twice."""
+        return sum(n for by_type in self.orphans.values() for n in by_type.values())
+
+    def __str__(self):
+        found = ", ".join(
+            f"{label}/{entity_type}={n}" for label, by_type in self.orphans.items() for entity_type, n in by_type.items()
+        )
+        return f"orphans={self.total} ({found or 'none'}) deleted={self.deleted}"
+
+
+def scan() -> IntegrityReport:
+    """Count orphans per reference and entity type; only non-zero counts are kept."""
+    report = IntegrityReport()
+    for ref in REFERENCES:
+        for entity_type in [*ENTITY_MODELS, UNKNOWN]:
+            n = orphans(ref, entity_type).count()
+            if n:
+                report.orphans.setdefault(ref.label, {})[entity_type] = n
+    return report
+
+
+def delete_orphans(report: Optional[IntegrityReport] = None, batch_size: int = 5000) -> IntegrityReport:
+    """
+    Delete every orphan found by `report` (default: a fresh scan()) in
+    batches of at most `batch_size` rows, walking each anti-join in pk order
+    so a batch never rescans rows already visited. Identities that may lose
+    access through a deleted identity are refreshed once at the end.
+    """
+    report = report or scan()
+    lost = set()
+    for ref in REFERENCES:
+        for entity_type in report.orphans.get(ref.label, {}):
+            last = None
+            while True:
+                qs = orphans(ref, entity_type).order_by("pk")
+                if last is not None:
+                    qs = qs.filter(pk__gt=last)
+                pks = list(qs.values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                batch = ref.model.objects.filter(pk__in=pks)
+                with transaction.atomic():
+                    # Rows through a deleted asset, group or identity went with it (FK cascade),
+                    # except those of principals assuming a deleted identity as a role.
+                    if ref.model is EntityRelationship and entity_type == EntityType.IDENTITY:
+                        lost |= affected_identities(batch.values_list(
+                            "from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id",
+                        ))
+                    report.deleted += delete_edges(batch) if ref.model is EntityRelationship else batch.delete()[0]
+                last = pks[-1]
+    refresh_identities(lost)
+    return report
+
+
+def record_scan(delete: bool = False, batch_size: int = 5000) -> IntegrityScan:
+    """Scan (and optionally delete) and store the result for the dashboard."""
+    started = timezone.now()
+    report = scan()
+    if delete and report.total:
+        delete_orphans(report, batch_size=batch_size)
+    return IntegrityScan.objects.create(
+        started_at=started, finished_at=timezone.now(),
+        orphans=report.orphans, orphan_count=report.total, deleted=report.deleted,
+    )
@@ -0,0 +1,57 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from intelligence.graph_index import REL_TYPE_CODES, AdjacencyIndex, np
+from intelligence.paths import shortest_paths, warm
+
+
+class Command(BaseCommand):
+    help = "Time shortest/top-K attack path queries on a synthetic in-memory graph (no database writes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nodes", type=int, default=1_000_000)
+        parser.add_argument("--edges", type=int, default=3_000_000)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--k", type=int, default=3, help="Paths per query for the top-K run")
+        parser.add_argument("--max-cost", type=float, default=float("inf"))
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        if np is None:
+            raise CommandError("numpy is required for the graph index")
+        n, m = opts["nodes"], opts["edges"]
+        rng = np.random.default_rng(opts["seed"])
+        started = time.perf_counter()
+        index = AdjacencyIndex.from_arrays(
+            ["asset"] * n,
+            rng.integers(0, n, m, dtype=np.int32),
+            rng.integers(0, n, m, dtype=np.int32),
+            rng.integers(0, len(REL_TYPE_CODES), m).astype(np.uint8),
+            confidence=rng.uniform(0.3, 1.0, m).astype(np.float32),
+        )
+        self.stdout.write(
+            f"Built index: {index.node_count} nodes, {index.edge_count} edges, "
+            f"{index.memory_bytes() / 2**20:.0f} MiB in {time.perf_counter() - started:.1f}s"
+        )
+
+        started = time.perf_counter()
+        warm(index)
+        self.stdout.write(f"Prepared path adjacency in {time.perf_counter() - started:.1f}s")
+
+        pick = random.Random(opts["seed"])
+        pairs = [(index.node(pick.randrange(n))[1], index.node(pick.randrange(n))[1]) for _ in range(opts["queries"])]
+        for k in (1, opts["k"]):
+            timings, found = [], 0
+            for a, b in pairs:
+                t0 = time.perf_counter()
+                paths = shortest_paths("asset", a, "asset", b, k=k, max_cost=opts["max_cost"], index=index, use_cache=False)
+                timings.append((time.perf_counter() - t0) * 1000)
+                found += bool(paths)
+            timings.sort()
+            self.stdout.write(self.style.SUCCESS(
+                f"k={k}: {found}/{len(pairs)} connected, median {statistics.median(timings):.1f} ms, "
+                f"p95 {timings[int(0.95 * (len(timings) - 1))]:.1f} ms, max {timings[-1]:.1f} ms"
+            ))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from intelligence.connectors.base import BaseConnector, ConnectorConfig
+from intelligence.models import RawRecord, SyncRun
+
+
+class SyntheticConnector(BaseConnector):
+    def __init__(self, config: ConnectorConfig, count: int):
+        super().__init__(config)
+        self.count = count
+
+    def record_type(self) -> str:
+        return "bench"
+
+    def fetch_records(self):
+        for i in range(self.count):
+            yield {"sys_id": f"ci-{i:08d}", "name": f"host-{i}", "class": "cmdb_ci_server", "os": "Linux", "ram_mb": 4096}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time RawRecord ingest one row per INSERT (the old path) against the batched BaseConnector.ingest() "
+        "on synthetic payloads. Deletes its rows and runs afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--source", default="bench-ingest")
+        parser.add_argument("--skip-per-row", action="store_true", help="Only time the batched path")
+
+    def handle(self, *args, **opts):
+        n, source = opts["records"], opts["source"]
+        connector = SyntheticConnector(ConnectorConfig(source=source, batch_size=opts["batch_size"]), n)
+        runs = []
+        try:
+            per_row = None
+            if not opts["skip_per_row"]:
+                run = SyncRun.objects.create(source=source, started_at=timezone.now(), success=False)
+                runs.append(run)
+                started = time.perf_counter()
+                for payload in connector.fetch_records():
+                    RawRecord.objects.create(
+                        sync_run=run, source=source, record_type=connector.record_type(),
+                        external_id=connector.external_id_from_payload(payload), payload=payload,
+                    )
+                per_row = time.perf_counter() - started
+                self.stdout.write(f"per-row: {n} rows in {per_row:.2f}s ({n / per_row:,.0f} rows/s)")
+                # Start the batched run from an empty table, not a fully unchanged one.
+                RawRecord.objects.filter(sync_run=run).delete()
+
+            started = time.perf_counter()
+            run = connector.ingest()
+            runs.append(run)
+            batched = time.perf_counter() - started
+            if not run.success:
+                self.stderr.write(run.error)
+                return
+            self.stdout.write(
+                f"batched: {run.records_stored} rows in {batched:.2f}s ({run.rows_per_sec:,.0f} rows/s), "
+                f"batch write ms {run.metrics['batch_write_ms']}"
+            )
+            if per_row is not None:
+                self.stdout.write(self.style.SUCCESS(f"speed-up: {per_row / batched:.1f}x"))
+        finally:
+            RawRecord.objects.filter(sync_run__in=runs).delete()
+            SyncRun.objects.filter(pk__in=[r.pk for r in runs]).delete()
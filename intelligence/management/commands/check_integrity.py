@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.integrity import record_scan, scan
+
+
+class Command(BaseCommand):
+    help = "Find relationships and external IDs that point at deleted entities, optionally deleting them in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete", action="store_true", help="Delete the orphans found")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Report counts without recording a scan")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"[dry run] {scan()}"))
+            return
+        result = record_scan(delete=opts["delete"], batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(str(result)))
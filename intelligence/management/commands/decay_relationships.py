@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.edges import decay_edges
+
+
+class Command(BaseCommand):
+    help = "Decay the confidence of relationships not reconfirmed recently and expire stale ones (settings.INTELLIGENCE_EDGE_DECAY)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window-days", type=int, default=None, help="Edges not confirmed for this long are stale")
+        parser.add_argument("--factor", type=float, default=None, help="Multiply stale edges' confidence by this")
+        parser.add_argument("--expire-days", type=int, default=None, help="Delete stale edges not confirmed for this long")
+        parser.add_argument("--min-confidence", type=float, default=None, help="Delete stale edges decaying below this")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+
+    def handle(self, *args, **opts):
+        result = decay_edges(
+            dry_run=opts["dry_run"],
+            window_days=opts["window_days"],
+            factor=opts["factor"],
+            expire_days=opts["expire_days"],
+            min_confidence=opts["min_confidence"],
+        )
+        prefix = "[dry run] " if opts["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
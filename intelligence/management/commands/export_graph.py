@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from intelligence.export import DEFAULT_FORMAT, EXPORT_TABLES, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = "Stream the inventory and relationship graph to columnar files (compressed NumPy .npz per chunk)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("out", help="Output directory; its manifest.json tracks incremental watermarks")
+        parser.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT)
+        parser.add_argument("--table", action="append", choices=[t.name for t in EXPORT_TABLES], dest="tables",
+                            help="Only export this table (repeatable)")
+        parser.add_argument("--incremental", action="store_true", help="Only rows changed since the last export into OUT")
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Rows fetched and written per chunk")
+
+    def handle(self, *args, **opts):
+        try:
+            result = export(opts["out"], fmt=opts["format"], tables=opts["tables"],
+                            incremental=opts["incremental"], chunk_size=opts["chunk_size"])
+        except ImportError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(str(result)))
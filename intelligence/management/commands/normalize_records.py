@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.workers import effective_workers, run_workers
+
+
+class Command(BaseCommand):
+    help = "Normalize pending RawRecords into the inventory models using parallel workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: CPU count; always 1 on SQLite)")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--lease-seconds", type=int, default=300, help="How long a claimed batch stays reserved")
+        parser.add_argument("--source", default=None)
+        parser.add_argument("--record-type", default=None)
+
+    def handle(self, *args, **opts):
+        workers = effective_workers(opts["workers"])
+        if opts["workers"] and opts["workers"] > workers:
+            self.stderr.write(f"The database allows a single writer: running {workers} worker instead of {opts['workers']}.")
+        result = run_workers(
+            workers=opts["workers"],
+            chunk_size=opts["chunk_size"],
+            lease_seconds=opts["lease_seconds"],
+            source=opts["source"],
+            record_type=opts["record_type"],
+        )
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = "Apply the RawRecord retention policy (settings.INTELLIGENCE_RETENTION) in bounded delete batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=None, help="Only prune records from this source")
+        parser.add_argument("--keep-runs", type=int, default=None, help="Keep raw records of the last N runs per source")
+        parser.add_argument("--no-latest-only", dest="latest_only", action="store_false", default=None,
+                            help="Keep superseded processed records")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be pruned without deleting")
+
+    def handle(self, *args, **opts):
+        result = apply_retention(
+            source=opts["source"],
+            dry_run=opts["dry_run"],
+            keep_runs=opts["keep_runs"],
+            latest_only=opts["latest_only"],
+            batch_size=opts["batch_size"],
+        )
+        prefix = "[dry run] " if opts["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.hierarchy import HIERARCHIES, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the Team/Environment closure tables from their parent pointers."
+
+    def handle(self, *args, **opts):
+        for model in HIERARCHIES:
+            rows = rebuild(model)
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name}: {rows} closure rows"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the global search entries (and full-text index) from the inventory tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        written = rebuild(chunk_size=opts["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{written} search entries written"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.access import rebuild_effective_access, refresh_changed
+
+
+class Command(BaseCommand):
+    help = "Refresh the materialized EffectiveAccess table for identities affected by edges changed since the last refresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute the whole table (also drops access from deleted edges)")
+
+    def handle(self, *args, **opts):
+        if opts["full"]:
+            rows = rebuild_effective_access()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt effective access: {rows} rows"))
+        else:
+            n = refresh_changed()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed effective access for {n} identities"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from intelligence.connectors.registry import autodiscover_connectors, registered_connectors
+from intelligence.scheduler import ConnectorScheduler
+
+
+class Command(BaseCommand):
+    help = "Run enabled registered connectors concurrently, by priority, with retries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Connector names to run (default: all enabled)")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--per-source", type=int, default=1, help="Max concurrent connectors per source")
+        parser.add_argument("--retries", type=int, default=3)
+        parser.add_argument("--backoff", type=float, default=30.0, help="Base retry delay in seconds")
+        parser.add_argument("--normalize", action="store_true", help="Normalize after each successful ingest")
+        parser.add_argument("--list", action="store_true", help="List registered connectors and exit")
+
+    def handle(self, *args, **opts):
+        if opts["list"]:
+            autodiscover_connectors()
+            for name, cls, config in registered_connectors():
+                state = "enabled" if config.enabled else "disabled"
+                self.stdout.write(f"{config.priority:>5}  {name}  ({config.source}, {state})")
+            return
+
+        scheduler = ConnectorScheduler(
+            max_workers=opts["workers"],
+            per_source_limit=opts["per_source"],
+            max_retries=opts["retries"],
+            backoff_base=opts["backoff"],
+            normalize=opts["normalize"],
+        )
+        for result in scheduler.run(opts["names"]):
+            style = self.style.SUCCESS if result.success or result.skipped else self.style.ERROR
+            self.stdout.write(style(str(result)))
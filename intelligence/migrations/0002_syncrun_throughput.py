@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='records_stored',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='rows_per_sec',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
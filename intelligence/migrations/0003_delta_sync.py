@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:14
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0002_syncrun_throughput'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source', models.CharField(choices=[('servicenow', 'ServiceNow'), ('flexera', 'Flexera'), ('active_directory', 'Active Directory'), ('okta', 'Okta'), ('duo', 'Duo'), ('aws', 'AWS'), ('azure', 'Azure'), ('gcp', 'GCP'), ('manual', 'Manual'), ('other', 'Other')], max_length=64)),
+                ('record_type', models.CharField(max_length=128)),
+                ('cursor', models.CharField(blank=True, default='', max_length=256)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rawrecord',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='sha256 of canonical JSON payload', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='records_skipped',
+            field=models.PositiveIntegerField(default=0, help_text='Unchanged payloads not re-stored'),
+        ),
+        migrations.AddIndex(
+            model_name='rawrecord',
+            index=models.Index(fields=['source', 'record_type', 'content_hash'], name='intelligenc_source_8b630f_idx'),
+        ),
+        migrations.AddField(
+            model_name='syncwatermark',
+            name='sync_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='watermarks', to='intelligence.syncrun'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='syncwatermark',
+            unique_together={('source', 'record_type')},
+        ),
+    ]
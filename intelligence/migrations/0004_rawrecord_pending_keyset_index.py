@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0003_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rawrecord',
+            name='intelligenc_process_475e32_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rawrecord',
+            index=models.Index(fields=['processed', 'created_at', 'id'], name='intelligenc_process_cc014d_idx'),
+        ),
+    ]
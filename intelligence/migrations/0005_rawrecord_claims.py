@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0004_rawrecord_pending_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawrecord',
+            name='claim_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rawrecord',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='rawrecord',
+            index=models.Index(fields=['claim_token'], name='intelligenc_claim_t_c463af_idx'),
+        ),
+    ]
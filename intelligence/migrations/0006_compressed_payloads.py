@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0005_rawrecord_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayloadBlob',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('codec', models.CharField(default='zlib', max_length=16)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0, help_text='Uncompressed size in bytes')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='rawrecord',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
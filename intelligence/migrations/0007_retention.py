@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0006_compressed_payloads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='bytes_pruned',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='records_pruned',
+            field=models.PositiveIntegerField(default=0, help_text='RawRecords removed by retention'),
+        ),
+        migrations.AddIndex(
+            model_name='rawrecord',
+            index=models.Index(fields=['content_hash'], name='intelligenc_content_bddbaf_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0007_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='bytes_fetched',
+            field=models.BigIntegerField(default=0, help_text='Canonical JSON size of fetched payloads'),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='fetch_seconds',
+            field=models.FloatField(default=0, help_text='Time spent waiting on the source'),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-batch latency percentiles etc.'),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='records_fetched',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='write_seconds',
+            field=models.FloatField(default=0, help_text='Time spent writing RawRecords'),
+        ),
+    ]
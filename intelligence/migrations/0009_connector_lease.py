@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0008_syncrun_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConnectorLease',
+            fields=[
+                ('name', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('holder', models.CharField(max_length=128)),
+                ('acquired_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Frozen copy of SourceSystem order at the time of this migration (models.SOURCE_BITS).
+SOURCES = ["servicenow", "flexera", "active_directory", "okta", "duo", "aws", "azure", "gcp", "manual", "other"]
+EDGE_KEY = ("from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id")
+
+
+def merge_duplicate_edges(apps, schema_editor):
+    EntityRelationship = apps.get_model("intelligence", "EntityRelationship")
+    for i, source in enumerate(SOURCES):
+        EntityRelationship.objects.filter(source=source).update(source_mask=1 << i)
+    duplicates = (
+        EntityRelationship.objects.values(*EDGE_KEY).annotate(n=Count("id")).filter(n__gt=1).order_by().iterator()
+    )
+    for key in duplicates:
+        key.pop("n")
+        edges = list(EntityRelationship.objects.filter(**key).order_by("created_at", "id"))
+        keep = edges[0]
+        for edge in edges[1:]:
+            keep.source_mask |= edge.source_mask
+            keep.confidence = max(keep.confidence, edge.confidence)
+            if edge.last_confirmed_at and (not keep.last_confirmed_at or edge.last_confirmed_at > keep.last_confirmed_at):
+                keep.last_confirmed_at = edge.last_confirmed_at
+        keep.save(update_fields=["source_mask", "confidence", "last_confirmed_at"])
+        EntityRelationship.objects.filter(pk__in=[e.pk for e in edges[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0009_connector_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entityrelationship',
+            name='source_mask',
+            field=models.PositiveIntegerField(default=0, help_text='Bitmask of every source asserting the edge'),
+        ),
+        migrations.AlterField(
+            model_name='entityrelationship',
+            name='source',
+            field=models.CharField(choices=[('servicenow', 'ServiceNow'), ('flexera', 'Flexera'), ('active_directory', 'Active Directory'), ('okta', 'Okta'), ('duo', 'Duo'), ('aws', 'AWS'), ('azure', 'Azure'), ('gcp', 'GCP'), ('manual', 'Manual'), ('other', 'Other')], default='manual', help_text='Source that first asserted the edge', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='entityrelationship',
+            index=models.Index(fields=['last_confirmed_at'], name='intelligenc_last_co_c1c781_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_edges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='entityrelationship',
+            constraint=models.UniqueConstraint(fields=('from_entity_type', 'from_entity_id', 'relationship_type', 'to_entity_type', 'to_entity_id'), name='unique_entity_relationship'),
+        ),
+        # Only once the constraint's index exists: merge_duplicate_edges() looks up every duplicate key by it.
+        migrations.RemoveIndex(
+            model_name='entityrelationship',
+            name='intelligenc_from_en_77cc8c_idx',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closures(apps, schema_editor):
+    for model_name, parent in (("Team", "parent_team_id"), ("Environment", "parent_environment_id")):
+        closure = apps.get_model("intelligence", f"{model_name}Closure")
+        parents = dict(apps.get_model("intelligence", model_name).objects.values_list("pk", parent))
+        rows = []
+        for pk in parents:
+            node, depth, seen = pk, 0, set()
+            while node is not None and node not in seen:
+                seen.add(node)
+                rows.append(closure(ancestor_id=node, descendant_id=pk, depth=depth))
+                node, depth = parents.get(node), depth + 1
+        closure.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0010_relationship_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvironmentClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='intelligence.environment')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='intelligence.environment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='intelligenc_descend_0d892c_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='intelligence.team')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='intelligence.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='intelligenc_descend_c97a69_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0011_hierarchy_closures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access', models.CharField(choices=[('runs_in', 'Runs in'), ('hosted_in', 'Hosted in'), ('depends_on', 'Depends on'), ('connected_to', 'Connected to'), ('backs_up', 'Backs up'), ('parent_of', 'Parent of'), ('located_at', 'Located at'), ('owns', 'Owns'), ('uses', 'Uses'), ('admin_of', 'Admin of'), ('has_access_to', 'Has access to'), ('member_of', 'Member of'), ('manages', 'Manages'), ('assumes_role', 'Assumes role'), ('other', 'Other')], help_text='has_access_to or admin_of', max_length=64)),
+                ('path', models.CharField(choices=[('direct', 'Direct'), ('group', 'Via group'), ('role', 'Via assumed role')], max_length=16)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_access', to='intelligence.asset')),
+                ('identity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_access', to='intelligence.identity')),
+                ('via_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='intelligence.group')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['asset', 'access'], name='intelligenc_asset_i_cbfebb_idx'), models.Index(fields=['identity', 'access'], name='intelligenc_identit_131607_idx'), models.Index(fields=['via_group'], name='intelligenc_via_gro_8e5262_idx')],
+            },
+        ),
+    ]
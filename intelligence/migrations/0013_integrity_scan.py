@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:49
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0012_effective_access'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntegrityScan',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('orphans', models.JSONField(blank=True, default=dict, help_text='{reference: {entity_type: count}}')),
+                ('orphan_count', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0013_integrity_scan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entityrelationship',
+            index=models.Index(fields=['updated_at', 'id'], name='intelligenc_updated_ce7240_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncrun',
+            index=models.Index(fields=['started_at', 'id'], name='intelligenc_started_14517a_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0014_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='intelligenc_critica_53f713_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='identity',
+            name='intelligenc_status_271494_idx',
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['type', 'criticality', 'data_classification', 'lifecycle_state', 'owner_team'], name='intelligenc_type_814a02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['criticality', 'data_classification', 'lifecycle_state', 'owner_team', 'type'], name='intelligenc_critica_9ee1b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['data_classification', 'lifecycle_state', 'owner_team', 'type', 'criticality'], name='intelligenc_data_cl_66cb34_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['lifecycle_state', 'owner_team', 'type', 'criticality', 'data_classification'], name='intelligenc_lifecyc_ce958b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['owner_team', 'type', 'criticality', 'data_classification', 'lifecycle_state'], name='intelligenc_owner_t_103940_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['type', 'status', 'lifecycle_state', 'owner_team'], name='intelligenc_type_efcd71_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['status', 'lifecycle_state', 'owner_team', 'type'], name='intelligenc_status_291687_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['lifecycle_state', 'owner_team', 'type', 'status'], name='intelligenc_lifecyc_c3bee0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identity',
+            index=models.Index(fields=['owner_team', 'type', 'status', 'lifecycle_state'], name='intelligenc_owner_t_2a6e1e_idx'),
+        ),
+    ]
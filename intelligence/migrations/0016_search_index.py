@@ -0,0 +1,80 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Full-text index over SearchEntry (see intelligence.search); entries are
+# filled by manage.py rebuild_search_index. entity_type is indexed on SQLite
+# so type filters are part of the MATCH. The triggers live on
+# intelligence_searchentry: a later migration that remakes that table must
+# recreate them.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE intelligence_searchentry_fts USING fts5("
+    "title, text, entity_type, content='intelligence_searchentry', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER intelligence_searchentry_fts_ai AFTER INSERT ON intelligence_searchentry BEGIN "
+    "INSERT INTO intelligence_searchentry_fts(rowid, title, text, entity_type) "
+    "VALUES (new.id, new.title, new.text, new.entity_type); END",
+    "CREATE TRIGGER intelligence_searchentry_fts_ad AFTER DELETE ON intelligence_searchentry BEGIN "
+    "INSERT INTO intelligence_searchentry_fts(intelligence_searchentry_fts, rowid, title, text, entity_type) "
+    "VALUES ('delete', old.id, old.title, old.text, old.entity_type); END",
+    "CREATE TRIGGER intelligence_searchentry_fts_au AFTER UPDATE ON intelligence_searchentry BEGIN "
+    "INSERT INTO intelligence_searchentry_fts(intelligence_searchentry_fts, rowid, title, text, entity_type) "
+    "VALUES ('delete', old.id, old.title, old.text, old.entity_type); "
+    "INSERT INTO intelligence_searchentry_fts(rowid, title, text, entity_type) "
+    "VALUES (new.id, new.title, new.text, new.entity_type); END",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS intelligence_searchentry_fts_ai",
+    "DROP TRIGGER IF EXISTS intelligence_searchentry_fts_ad",
+    "DROP TRIGGER IF EXISTS intelligence_searchentry_fts_au",
+    "DROP TABLE IF EXISTS intelligence_searchentry_fts",
+]
+# Punctuation is turned into spaces so both backends split "j.doe@example.com" into words.
+POSTGRESQL_FORWARD = [
+    "ALTER TABLE intelligence_searchentry ADD COLUMN document tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', regexp_replace(title, '[^[:alnum:]]+', ' ', 'g')), 'A') || "
+    "setweight(to_tsvector('simple', regexp_replace(\"text\", '[^[:alnum:]]+', ' ', 'g')), 'B')) STORED",
+    "CREATE INDEX intelligence_searchentry_document ON intelligence_searchentry USING GIN (document)",
+]
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS intelligence_searchentry_document",
+    "ALTER TABLE intelligence_searchentry DROP COLUMN IF EXISTS document",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {"sqlite": SQLITE_REVERSE, "postgresql": POSTGRESQL_REVERSE}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0015_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('asset', 'Asset'), ('identity', 'Identity'), ('group', 'Group'), ('environment', 'Environment'), ('location', 'Location'), ('team', 'Team'), ('business_service', 'Business Service')], max_length=64)),
+                ('entity_id', models.UUIDField()),
+                ('title', models.CharField(max_length=300)),
+                ('text', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('entity_type', 'entity_id')},
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
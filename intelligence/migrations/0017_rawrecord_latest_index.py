@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0016_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rawrecord',
+            index=models.Index(fields=['source', 'record_type', 'external_id', 'created_at'], name='intelligenc_source_7df42b_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:00
+
+from django.db import migrations
+from django.db.models import Count
+
+EXTERNAL_KEY = ("entity_type", "source", "external_id")
+
+
+def keep_newest_mapping(apps, schema_editor):
+    """Ids linked to several entities keep only their most recently written mapping."""
+    ExternalID = apps.get_model("intelligence", "ExternalID")
+    duplicates = (
+        ExternalID.objects.values(*EXTERNAL_KEY).annotate(n=Count("id")).filter(n__gt=1).order_by().iterator()
+    )
+    for key in duplicates:
+        key.pop("n")
+        ids = list(ExternalID.objects.filter(**key).order_by("-updated_at", "-created_at").values_list("id", flat=True))
+        ExternalID.objects.filter(pk__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0017_rawrecord_latest_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_newest_mapping, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='externalid',
+            unique_together={('entity_type', 'source', 'external_id')},
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:06
+
+from django.db import migrations
+
+# Frozen copy of SourceSystem order at the time of this migration (models.SOURCE_BITS).
+SOURCES = ["servicenow", "flexera", "active_directory", "okta", "duo", "aws", "azure", "gcp", "manual", "other"]
+
+
+def backfill_source_mask(apps, schema_editor):
+    """Edges written since 0010 without going through edges.assert_edges() are asserted by their source."""
+    EntityRelationship = apps.get_model("intelligence", "EntityRelationship")
+    for i, source in enumerate(SOURCES):
+        EntityRelationship.objects.filter(source_mask=0, source=source).update(source_mask=1 << i)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0018_externalid_unique_per_source'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_source_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0019_entityrelationship_source_mask_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='intelligenc_type_cb0550_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='intelligenc_critica_9ee1b0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='intelligenc_data_cl_66cb34_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='intelligenc_lifecyc_ce958b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='identity',
+            name='intelligenc_status_291687_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='identity',
+            name='intelligenc_lifecyc_c3bee0_idx',
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='owner_team',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assets', to='intelligence.team'),
+        ),
+        migrations.AlterField(
+            model_name='identity',
+            name='owner_team',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='identities', to='intelligence.team'),
+        ),
+    ]
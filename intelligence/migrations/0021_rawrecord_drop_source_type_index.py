@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0020_trim_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rawrecord',
+            name='intelligenc_source_2eb35e_idx',
+        ),
+    ]
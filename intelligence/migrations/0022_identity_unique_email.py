@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:37
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_duplicate_emails(apps, schema_editor):
+    """Emails shared by several identities stay on the most recently written one; the rest get a blank email."""
+    Identity = apps.get_model("intelligence", "Identity")
+    duplicates = (
+        Identity.objects.exclude(email="").values("email").annotate(n=Count("id")).filter(n__gt=1)
+        .order_by().iterator()
+    )
+    for row in duplicates:
+        ids = list(Identity.objects.filter(email=row["email"]).order_by("-updated_at", "-created_at")
+                   .values_list("id", flat=True))
+        Identity.objects.filter(pk__in=ids[1:]).update(email="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0021_rawrecord_drop_source_type_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='identity',
+            constraint=models.UniqueConstraint(condition=models.Q(('email', ''), _negated=True), fields=('email',), name='unique_identity_email'),
+        ),
+    ]
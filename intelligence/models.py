@@ -72,7 +72,8 @@ class ExternalID(TimeStampedModel):
     external_id_type = models.CharField(max_length=128, blank=True, default="")
 
     class Meta:
-        unique_together = ("entity_type", "entity_uuid", "source", "external_id")
+        # One entity per id within a source and entity type.
+        unique_together = ("entity_type", "source", "external_id")
         indexes = [
             models.Index(fields=["entity_type", "entity_uuid"]),
             models.Index(fields=["source", "external_id"]),
@@ -97,6 +98,10 @@ class Team(TimeStampedModel):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from .hierarchy import check_parent
+        check_parent(Team, self.pk, self.parent_team_id)
+
 
 class BusinessService(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -145,6 +150,10 @@ class Environment(TimeStampedModel):
     def __str__(self):
         return f"{self.name} ({self.type})"
 
+    def clean(self):
+        from .hierarchy import check_parent
+        check_parent(Environment, self.pk, self.parent_environment_id)
+
 
 class LocationType(models.TextChoices):
     OFFICE = "office", "Office"
@@ -213,7 +222,9 @@ class Identity(TimeStampedModel):
     auth_sources = models.JSONField(blank=True, default=list, help_text="e.g. ['AD','Okta','Duo']")
     last_login_at = models.DateTimeField(null=True, blank=True)
 
-    owner_team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL, related_name="identities")
+    # Indexed by the owner_team-led facet index below.
+    owner_team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL, related_name="identities",
+                                   db_index=False)
     lifecycle_state = models.CharField(max_length=32, choices=LifecycleState.choices, default=LifecycleState.ACTIVE)
 
     risk_flags = models.JSONField(blank=True, default=list, help_text="Tags like no_mfa, stale_account, etc.")
@@ -225,7 +236,13 @@ class Identity(TimeStampedModel):
         indexes = [
             models.Index(fields=["username"]),
             models.Index(fields=["email"]),
-            models.Index(fields=["status"]),
+            # Facet filters and counts (views.IdentityList), as for Asset.
+            models.Index(fields=["type", "status", "lifecycle_state", "owner_team"]),
+            models.Index(fields=["owner_team", "type", "status", "lifecycle_state"]),
+        ]
+        constraints = [
+            # The normalization natural key; identities without an email are matched by external id.
+            models.UniqueConstraint(fields=["email"], condition=~models.Q(email=""), name="unique_identity_email"),
         ]
 
     def __str__(self):
@@ -293,7 +310,9 @@ class Asset(TimeStampedModel):
     description = models.TextField(blank=True, default="")
 
     owner_person = models.ForeignKey(Identity, null=True, blank=True, on_delete=models.SET_NULL, related_name="owned_assets")
-    owner_team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL, related_name="assets")
+    # Indexed by the owner_team-led facet index below.
+    owner_team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL, related_name="assets",
+                                   db_index=False)
 
     business_service = models.ForeignKey(BusinessService, null=True, blank=True, on_delete=models.SET_NULL, related_name="assets")
 
@@ -310,17 +329,50 @@ class Asset(TimeStampedModel):
     source_of_truth = models.CharField(max_length=64, choices=SourceSystem.choices, default=SourceSystem.MANUAL)
 
     class Meta:
-        unique_together = ("type", "name")
+        unique_together = ("type", "name")  # also the index for type lookups
         indexes = [
-            models.Index(fields=["type"]),
             models.Index(fields=["name"]),
-            models.Index(fields=["criticality"]),
+            # Facet filters and counts (views.AssetList): every count branch is an index-only
+            # scan of one of these, a range scan when type or owner_team is selected. The
+            # low-cardinality facets get no index of their own; at 1M rows one per facet
+            # doubled the cost of writes for a 2x faster uncached unfiltered count.
+            models.Index(fields=["type", "criticality", "data_classification", "lifecycle_state", "owner_team"]),
+            models.Index(fields=["owner_team", "type", "criticality", "data_classification", "lifecycle_state"]),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.type})"
 
 
+# -------------------------
+# Hierarchy closures
+# -------------------------
+
+class TeamClosure(models.Model):
+    """
+    Every (ancestor, descendant) pair of the Team.parent_team tree, including
+    each team as its own ancestor at depth 0. Maintained by intelligence.hierarchy.
+    """
+    ancestor = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [models.Index(fields=["descendant", "depth"])]
+
+
+class EnvironmentClosure(models.Model):
+    """Same as TeamClosure, for Environment.parent_environment."""
+    ancestor = models.ForeignKey(Environment, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Environment, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [models.Index(fields=["descendant", "depth"])]
+
+
 # -------------------------
 # Relationships (graph)
 # -------------------------
@@ -343,7 +395,36 @@ class RelationshipType(models.TextChoices):
     OTHER = "other", "Other"
 
 
+# Bit per SourceSystem in EntityRelationship.source_mask. Append-only: the
+# position of a source must never change once edges have been written.
+SOURCE_BITS = {source: 1 << i for i, source in enumerate(SourceSystem.values)}
+
+
+class EntityRelationshipQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        One DELETE plus one effective-access refresh for the whole batch
+        (access.delete_and_refresh), instead of a post_delete refresh per row.
+        """
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        if self._fields is not None:
+            raise TypeError("Cannot call delete() after .values() or .values_list()")
+        from .access import delete_and_refresh
+        deleted = delete_and_refresh(self._chain())
+        self._result_cache = None
+        return deleted, {self.model._meta.label: deleted}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class EntityRelationship(TimeStampedModel):
+    """
+    One canonical row per (from, relationship_type, to) edge. Every source that
+    asserts the edge sets its bit in source_mask; confidence is aggregated over
+    those sources (see intelligence.edges).
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     from_entity_type = models.CharField(max_length=64, choices=EntityType.choices)
@@ -353,20 +434,103 @@ class EntityRelationship(TimeStampedModel):
     to_entity_id = models.UUIDField()
 
     relationship_type = models.CharField(max_length=64, choices=RelationshipType.choices)
-    source = models.CharField(max_length=64, choices=SourceSystem.choices, default=SourceSystem.MANUAL)
+    source = models.CharField(max_length=64, choices=SourceSystem.choices, default=SourceSystem.MANUAL,
+                              help_text="Source that first asserted the edge")
+    source_mask = models.PositiveIntegerField(default=0, help_text="Bitmask of every source asserting the edge")
     confidence = models.FloatField(default=1.0)
     last_confirmed_at = models.DateTimeField(null=True, blank=True)
 
+    objects = EntityRelationshipQuerySet.as_manager()
+
     class Meta:
+        constraints = [
+            # Also serves lookups by the from end.
+            models.UniqueConstraint(
+                fields=["from_entity_type", "from_entity_id", "relationship_type", "to_entity_type", "to_entity_id"],
+                name="unique_entity_relationship",
+            ),
+        ]
         indexes = [
-            models.Index(fields=["from_entity_type", "from_entity_id"]),
             models.Index(fields=["to_entity_type", "to_entity_id"]),
             models.Index(fields=["relationship_type"]),
+            models.Index(fields=["last_confirmed_at"]),
+            models.Index(fields=["updated_at", "id"]),  # cursor pages, changed-since scans
         ]
 
     def __str__(self):
         return f"{self.from_entity_type}:{self.from_entity_id} -[{self.relationship_type}]-> {self.to_entity_type}:{self.to_entity_id}"
 
+    def save(self, *args, **kwargs):
+        # Edges created outside edges.assert_edges() (admin, shell) are asserted by their source.
+        if not self.source_mask and self.source in SOURCE_BITS:
+            self.source_mask = SOURCE_BITS[self.source]
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "source_mask"}
+        super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # Through the queryset, so admin and ORM deletes refresh effective access (no post_delete receiver).
+        if self.pk is None:
+            raise ValueError(f"{self._meta.object_name} object can't be deleted because its id attribute is set to None.")
+        return type(self)._default_manager.db_manager(using).filter(pk=self.pk).delete()
+
+    @property
+    def sources(self):
+        return [source for source, bit in SOURCE_BITS.items() if self.source_mask & bit]
+
+
+# -------------------------
+# Effective access (materialized)
+# -------------------------
+
+class AccessPath(models.TextChoices):
+    DIRECT = "direct", "Direct"
+    GROUP = "group", "Via group"
+    ROLE = "role", "Via assumed role"
+
+
+class EffectiveAccess(models.Model):
+    """
+    Identity -> Asset access derived from group membership and HAS_ACCESS_TO /
+    ADMIN_OF / ASSUMES_ROLE edges. Maintained by intelligence.access; don't edit.
+    """
+    identity = models.ForeignKey(Identity, on_delete=models.CASCADE, related_name="effective_access")
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="effective_access")
+    access = models.CharField(max_length=64, choices=RelationshipType.choices, help_text="has_access_to or admin_of")
+    path = models.CharField(max_length=16, choices=AccessPath.choices)
+    via_group = models.ForeignKey(Group, null=True, blank=True, on_delete=models.CASCADE, related_name="+")
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["asset", "access"]),
+            models.Index(fields=["identity", "access"]),
+            models.Index(fields=["via_group"]),
+        ]
+
+    def __str__(self):
+        return f"{self.identity_id} -[{self.access} {self.path}]-> {self.asset_id}"
+
+
+class SearchEntry(models.Model):
+    """
+    Searchable text of one inventory entity: `title` is its display name,
+    `text` its other searchable fields and external IDs. The full-text index
+    over both is backend specific (see intelligence.search); maintained
+    there, don't edit.
+    """
+    entity_type = models.CharField(max_length=64, choices=EntityType.choices)
+    entity_id = models.UUIDField()
+    title = models.CharField(max_length=300)
+    text = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("entity_type", "entity_id")
+
+    def __str__(self):
+        return f"{self.entity_type}:{self.entity_id} {self.title}"
+
 
 # -------------------------
 # Raw ingest + sync runs
@@ -381,13 +545,98 @@ class SyncRun(TimeStampedModel):
     summary = models.TextField(blank=True, default="")
     error = models.TextField(blank=True, default="")
 
+    records_fetched = models.PositiveIntegerField(default=0)
+    records_stored = models.PositiveIntegerField(default=0)
+    records_skipped = models.PositiveIntegerField(default=0, help_text="Unchanged payloads not re-stored")
+    bytes_fetched = models.BigIntegerField(default=0, help_text="Canonical JSON size of fetched payloads")
+    fetch_seconds = models.FloatField(default=0, help_text="Time spent waiting on the source")
+    write_seconds = models.FloatField(default=0, help_text="Time spent writing RawRecords")
+    rows_per_sec = models.FloatField(null=True, blank=True)
+    metrics = models.JSONField(blank=True, default=dict, help_text="Per-batch latency percentiles etc.")
+
+    records_pruned = models.PositiveIntegerField(default=0, help_text="RawRecords removed by retention")
+    bytes_pruned = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["started_at", "id"]),  # cursor pages of the run list
+        ]
+
     def __str__(self):
         return f"{self.source} sync @ {self.started_at:%Y-%m-%d %H:%M} ({'ok' if self.success else 'fail'})"
 
+    @property
+    def batch_p95_ms(self):
+        return (self.metrics or {}).get("batch_write_ms", {}).get("p95")
+
+
+class SyncWatermark(TimeStampedModel):
+    """
+    Last-modified cursor per source/record_type; only advanced by successful runs.
+    Connectors read it to ask the source for changes since the previous sync.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source = models.CharField(max_length=64, choices=SourceSystem.choices)
+    record_type = models.CharField(max_length=128)
+    cursor = models.CharField(max_length=256, blank=True, default="")
+    sync_run = models.ForeignKey(SyncRun, null=True, blank=True, on_delete=models.SET_NULL, related_name="watermarks")
+
+    class Meta:
+        unique_together = ("source", "record_type")
+
+    def __str__(self):
+        return f"{self.source}:{self.record_type} @ {self.cursor or '-'}"
+
+
+class ConnectorLease(models.Model):
+    """
+    Held by the scheduler while a connector runs, so overlapping runs of the
+    same connector (from another thread, process or host) are skipped.
+    """
+    name = models.CharField(max_length=128, primary_key=True)
+    holder = models.CharField(max_length=128)
+    acquired_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at:%Y-%m-%d %H:%M}"
+
+
+class IntegrityScan(models.Model):
+    """
+    One run of integrity.scan(): orphaned polymorphic references found (and
+    deleted) per reference and EntityType. The dashboard shows the latest.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    orphans = models.JSONField(blank=True, default=dict, help_text="{reference: {entity_type: count}}")
+    orphan_count = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Integrity scan @ {self.started_at:%Y-%m-%d %H:%M}: {self.orphan_count} orphans, {self.deleted} deleted"
+
+
+class PayloadBlob(models.Model):
+    """
+    Compressed, content-addressed RawRecord payload, shared by every RawRecord
+    with the same content_hash. Only used when INTELLIGENCE_PAYLOAD_STORAGE = "compressed".
+    """
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    codec = models.CharField(max_length=16, default="zlib")
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0, help_text="Uncompressed size in bytes")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.codec}, {self.size}B)"
+
 
 class RawRecord(TimeStampedModel):
     """
     Store raw API payloads for audit/debugging.
+    payload is NULL when the body lives in PayloadBlob; use get_payload().
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     sync_run = models.ForeignKey(SyncRun, null=True, blank=True, on_delete=models.SET_NULL, related_name="raw_records")
@@ -395,17 +644,44 @@ class RawRecord(TimeStampedModel):
     source = models.CharField(max_length=64, choices=SourceSystem.choices)
     record_type = models.CharField(max_length=128, help_text="Class/table/type from source, e.g., cmdb_ci_server")
     external_id = models.CharField(max_length=256, blank=True, default="")
-    payload = models.JSONField()
+    payload = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="", help_text="sha256 of canonical JSON payload")
 
     processed = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True, default="")
 
+    # Set while a normalization worker owns the row; expired leases can be re-claimed.
+    claim_token = models.UUIDField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         indexes = [
-            models.Index(fields=["source", "record_type"]),
             models.Index(fields=["external_id"]),
-            models.Index(fields=["processed"]),
+            models.Index(fields=["processed", "created_at", "id"]),  # keyset scan of pending records
+            models.Index(fields=["source", "record_type", "content_hash"]),
+            models.Index(fields=["source", "record_type", "external_id", "created_at"]),  # newest per external_id
+            models.Index(fields=["content_hash"]),
+            models.Index(fields=["claim_token"]),
         ]
 
     def __str__(self):
         return f"{self.source}:{self.record_type}:{self.external_id or self.id}"
+
+    def get_payload(self):
+        if self.payload is None and self.content_hash:
+            from .payloads import hydrate
+            hydrate([self])
+        return self.payload
+
+
+# Polymorphic references (ExternalID, EntityRelationship) name their target by EntityType.
+ENTITY_MODELS = {
+    EntityType.ASSET: Asset,
+    EntityType.IDENTITY: Identity,
+    EntityType.GROUP: Group,
+    EntityType.ENVIRONMENT: Environment,
+    EntityType.LOCATION: Location,
+    EntityType.TEAM: Team,
+    EntityType.BUSINESS_SERVICE: BusinessService,
+}
+MODEL_ENTITY_TYPES = {model: entity_type for entity_type, model in ENTITY_MODELS.items()}
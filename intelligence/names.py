@@ -0,0 +1,103 @@
+"""
+Display names for polymorphic entity references.
+
+EntityRelationship endpoints, ExternalIDs and graph results name their target
+as (EntityType, UUID). EntityNameResolver collects such references, then loads
+only the fields each model's __str__ needs with one query per entity type, so
+a page of edges costs at most len(EntityType) queries whatever its size.
+
+    resolver = EntityNameResolver()
+    refs = resolver.resolve_many([(r.from_entity_type, r.from_entity_id) for r in page])
+    refs[("asset", some_id)].name, .url
+"""
+from __future__ import annotations
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple, Type
+
+from django.db import models
+from django.urls import reverse
+
+from .models import (
+    Asset, Identity, Group, Environment, Location,
+    BusinessService, Team, ENTITY_MODELS,
+)
+
+Node = Tuple[str, uuid.UUID]
+
+# Fields read by each model's __str__.
+DISPLAY_FIELDS: Dict[Type[models.Model], Tuple[str, ...]] = {
+    Asset: ("name", "type"),
+    Identity: ("display_name", "username"),
+    Group: ("name", "type"),
+    Environment: ("name", "type"),
+    Location: ("name", "type"),
+    Team: ("name",),
+    BusinessService: ("name",),
+}
+
+
+@dataclass(frozen=True)
+class EntityRef:
+    entity_type: str
+    entity_id: uuid.UUID
+    name: str
+    exists: bool = False
+
+    @property
+    def url(self) -> Optional[str]:
+        """Detail page, or None when the entity no longer exists; reversed on use, not per reference."""
+        return detail_url(self.entity_type, self.entity_id) if self.exists else None
+
+    def __str__(self):
+        return self.name
+
+
+def detail_url(entity_type: str, entity_id: uuid.UUID) -> str:
+    return reverse(f"intelligence:{ENTITY_MODELS[entity_type]._meta.model_name}_detail", args=[entity_id])
+
+
+class EntityNameResolver:
+    """Per-request cache of EntityRefs; only references not seen before hit the database."""
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+        self._refs: Dict[Node, EntityRef] = {}
+
+    def resolve_many(self, nodes: Iterable[Node]) -> Dict[Node, EntityRef]:
+        nodes = set(nodes)
+        missing: Dict[str, Set[uuid.UUID]] = defaultdict(set)
+        for entity_type, entity_id in nodes:
+            if (entity_type, entity_id) not in self._refs:
+                missing[entity_type].add(entity_id)
+        for entity_type, ids in missing.items():
+            self._load(entity_type, list(ids))
+        return {node: self._refs[node] for node in nodes}
+
+    def resolve(self, entity_type: str, entity_id: uuid.UUID) -> EntityRef:
+        return self.resolve_many([(entity_type, entity_id)])[(entity_type, entity_id)]
+
+    def _load(self, entity_type: str, ids) -> None:
+        model = ENTITY_MODELS.get(entity_type)
+        found = {}
+        if model is not None:
+            qs = model.objects.only(*DISPLAY_FIELDS[model])
+            for i in range(0, len(ids), self.chunk_size):
+                found.update(qs.in_bulk(ids[i:i + self.chunk_size]))
+        for entity_id in ids:
+            obj = found.get(entity_id)
+            if obj is None:
+                self._refs[(entity_type, entity_id)] = EntityRef(entity_type, entity_id, str(entity_id))
+            else:
+                self._refs[(entity_type, entity_id)] = EntityRef(entity_type, entity_id, str(obj), exists=True)
+
+    def annotate_edges(self, edges: Iterable) -> None:
+        """Set .from_ref and .to_ref on each EntityRelationship in `edges`."""
+        edges = list(edges)
+        refs = self.resolve_many(
+            [(e.from_entity_type, e.from_entity_id) for e in edges] + [(e.to_entity_type, e.to_entity_id) for e in edges]
+        )
+        for e in edges:
+            e.from_ref = refs[(e.from_entity_type, e.from_entity_id)]
+            e.to_ref = refs[(e.to_entity_type, e.to_entity_id)]
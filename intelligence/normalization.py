@@ -0,0 +1,480 @@
+from __future__ import annotations
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Asset, Identity, Group, Environment, Location,
+    BusinessService, Team, RawRecord, MODEL_ENTITY_TYPES,
+)
+from .hierarchy import HIERARCHIES, sync_nodes
+from .search import index_entities
+from .payloads import hydrate
+from .resolver import ExternalIDResolver
+
+
+# Natural keys used to upsert normalized rows. Models with a matching DB unique
+# constraint go through INSERT ... ON CONFLICT; the rest are matched by lookup.
+# Identity keys on email: usernames are optional and collide across sources.
+# Its unique constraint is partial (blank emails are allowed), which ON CONFLICT
+# cannot target from Django, so it is matched by lookup with the constraint as
+# the backstop. Rows with a blank key never go through the key (they would all
+# merge into one): they are matched by their external ids instead.
+NATURAL_KEYS: Dict[Type[models.Model], Tuple[str, ...]] = {
+    Team: ("name",),
+    BusinessService: ("name",),
+    Environment: ("type", "name"),
+    Location: ("type", "name"),
+    Identity: ("email",),
+    Group: ("type", "name"),
+    Asset: ("type", "name"),
+}
+
+# Parents first, so Ref()s to them resolve within the same chunk.
+UPSERT_ORDER: Sequence[Type[models.Model]] = (
+    Team, BusinessService, Environment, Location, Identity, Group, Asset,
+)
+
+
+@dataclass(frozen=True)
+class Ref:
+    """Foreign key to another normalized entity, by its natural key values."""
+    model: Type[models.Model]
+    key: Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class ExtRef:
+    """Foreign key to an entity known only by a source-system id (AD objectGUID, Okta id, ARN...)."""
+    entity_type: str
+    source: str
+    external_id: str
+
+
+@dataclass
+class Mapped:
+    """
+    One normalized row produced by a mapper. `values` must contain the model's
+    natural key; `external_ids` are (source, external_id, external_id_type)
+    tuples recorded as ExternalID rows for the upserted entity.
+    """
+    model: Type[models.Model]
+    values: Dict[str, Any]
+    external_ids: List[Tuple[str, str, str]] = field(default_factory=list)
+
+    def key(self) -> Tuple[Any, ...]:
+        return tuple(self.values[f] for f in NATURAL_KEYS[self.model])
+
+    def check(self) -> None:
+        if _is_blank(self.key()) and not self.external_ids:
+            raise ValueError(f"blank natural key {NATURAL_KEYS[self.model]} for {self.model.__name__} "
+                             f"and no external ids to match it by")
+
+
+def _is_blank(key: Tuple[Any, ...]) -> bool:
+    return any(v is None or v == "" for v in key)
+
+
+Mapper = Callable[[RawRecord], Iterable[Mapped]]
+
+_MAPPERS: Dict[Tuple[str, str], Mapper] = {}
+
+
+def register_mapper(source: str, record_type: str) -> Callable[[Mapper], Mapper]:
+    """
+    Decorator registering a mapper for one source/record_type, e.g.
+
+        @register_mapper(SourceSystem.SERVICENOW, "cmdb_ci_server")
+        def map_server(record):
+            yield Mapped(Asset, {"type": AssetType.SERVER, "name": record.payload["name"]})
+    """
+    def decorator(fn: Mapper) -> Mapper:
+        _MAPPERS[(source, record_type)] = fn
+        return fn
+    return decorator
+
+
+def get_mapper(source: str, record_type: str) -> Optional[Mapper]:
+    return _MAPPERS.get((source, record_type))
+
+
+def registered_types() -> List[Tuple[str, str]]:
+    return list(_MAPPERS)
+
+
+# ---------------------------
+# Bulk upserts
+# ---------------------------
+
+def _has_unique_key(model: Type[models.Model], key_fields: Tuple[str, ...]) -> bool:
+    opts = model._meta
+    if len(key_fields) == 1 and opts.get_field(key_fields[0]).unique:
+        return True
+    return any(set(ut) == set(key_fields) for ut in opts.unique_together)
+
+
+def _fetch_ids(model: Type[models.Model], key_fields: Tuple[str, ...], keys: Iterable[Tuple[Any, ...]]) -> Dict[Tuple[Any, ...], Any]:
+    """Map natural key -> pk with one query (per-field IN, then exact match in Python). Blank keys never match."""
+    keys = {k for k in keys if not _is_blank(k)}
+    if not keys:
+        return {}
+    filters = {f"{f}__in": {k[i] for k in keys} for i, f in enumerate(key_fields)}
+    rows = model.objects.filter(**filters).values_list(*key_fields, "pk")
+    return {tuple(row[:-1]): row[-1] for row in rows if tuple(row[:-1]) in keys}
+
+
+def bulk_upsert(model: Type[models.Model], rows: List[Dict[str, Any]], batch_size: int = 1000) -> int:
+    """
+    Insert-or-update `rows` keyed on NATURAL_KEYS[model]. Rows sharing a key
+    are merged (later wins); rows with a blank key are skipped. Returns the
+    number of distinct keys written.
+    """
+    key_fields = NATURAL_KEYS[model]
+    merged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for values in rows:
+        key = tuple(values[f] for f in key_fields)
+        if not _is_blank(key):
+            merged.setdefault(key, {}).update(values)
+
+    # bulk_create needs one update_fields list per statement: group rows by column set.
+    by_columns: Dict[frozenset, List[Dict[str, Any]]] = defaultdict(list)
+    for values in merged.values():
+        by_columns[frozenset(values)].append(values)
+
+    if _has_unique_key(model, key_fields):
+        for columns, group in by_columns.items():
+            update_fields = sorted(columns - set(key_fields)) + ["updated_at"]
+            model.objects.bulk_create(
+                [model(**values) for values in group],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=key_fields,
+                update_fields=update_fields,
+            )
+        return len(merged)
+
+    existing = _fetch_ids(model, key_fields, merged)
+    now = timezone.now()
+    for columns, group in by_columns.items():
+        to_create, to_update = [], []
+        for values in group:
+            pk = existing.get(tuple(values[f] for f in key_fields))
+            if pk is None:
+                to_create.append(model(**values))
+            else:
+                to_update.append(model(pk=pk, updated_at=now, **values))
+        model.objects.bulk_create(to_create, batch_size=batch_size)
+        if to_update:
+            update_fields = sorted(columns - set(key_fields)) + ["updated_at"]
+            model.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+    return len(merged)
+
+
+def upsert_by_external_id(model: Type[models.Model], rows: List[Tuple[Mapped, Dict[str, Any]]],
+                          resolver: ExternalIDResolver, batch_size: int = 1000) -> List[Any]:
+    """
+    Upsert rows that have no natural key (e.g. identities without an email) by
+    their external ids: a row updates the entity its first linked id points
+    at, otherwise creates one; rows sharing an id merge (later wins). All the
+    rows' ids are linked to the result. Returns the pks written.
+    """
+    entity_type = MODEL_ENTITY_TYPES[model]
+    wanted: Dict[str, set] = defaultdict(set)
+    for m, _ in rows:
+        for source, ext, _ in m.external_ids:
+            wanted[source].add(ext)
+    known = {source: resolver.resolve_many(entity_type, source, exts) for source, exts in wanted.items()}
+    merged: Dict[Any, Dict[str, Any]] = {}
+    links = []
+    for m, values in rows:
+        pk = next((known[s][e] for s, e, _ in m.external_ids if e in known[s]), None)
+        if pk is None:
+            pk = model._meta.pk.get_default()
+        for source, ext, ext_type in m.external_ids:
+            known[source][ext] = pk
+            links.append((entity_type, pk, source, ext, ext_type))
+        merged.setdefault(pk, {}).update(values)
+
+    existing = set(model.objects.filter(pk__in=merged).values_list("pk", flat=True))
+    model.objects.bulk_create([model(pk=pk, **values) for pk, values in merged.items() if pk not in existing],
+                              batch_size=batch_size)
+    by_columns: Dict[frozenset, List[models.Model]] = defaultdict(list)
+    now = timezone.now()
+    for pk in existing:
+        by_columns[frozenset(merged[pk])].append(model(pk=pk, updated_at=now, **merged[pk]))
+    for columns, group in by_columns.items():
+        model.objects.bulk_update(group, sorted(columns) + ["updated_at"], batch_size=batch_size)
+    resolver.link_rows(links)
+    return list(merged)
+
+
+def _resolve_refs(rows: List[Dict[str, Any]], resolver: ExternalIDResolver) -> None:
+    """
+    Replace Ref/ExtRef values with `<field>_id` pks: one query per referenced
+    model, and one per (entity_type, source) for external ids not yet cached.
+    """
+    wanted: Dict[Type[models.Model], set] = defaultdict(set)
+    wanted_ext: Dict[Tuple[str, str], set] = defaultdict(set)
+    for values in rows:
+        for v in values.values():
+            if isinstance(v, Ref):
+                wanted[v.model].add(v.key)
+            elif isinstance(v, ExtRef):
+                wanted_ext[(v.entity_type, v.source)].add(v.external_id)
+    if not (wanted or wanted_ext):
+        return
+    ids = {m: _fetch_ids(m, NATURAL_KEYS[m], keys) for m, keys in wanted.items()}
+    ext_ids = {k: resolver.resolve_many(k[0], k[1], exts) for k, exts in wanted_ext.items()}
+    for values in rows:
+        for name, v in list(values.items()):
+            if isinstance(v, Ref):
+                del values[name]
+                values[f"{name}_id"] = ids[v.model].get(v.key)
+            elif isinstance(v, ExtRef):
+                del values[name]
+                values[f"{name}_id"] = ext_ids[(v.entity_type, v.source)].get(v.external_id)
+
+
+def _link_external_ids(model: Type[models.Model], links: List[Tuple[Tuple[Any, ...], List[Tuple[str, str, str]]]],
+                       resolver: ExternalIDResolver) -> None:
+    if not links:
+        return
+    pks = _fetch_ids(model, NATURAL_KEYS[model], (key for key, _ in links))
+    entity_type = MODEL_ENTITY_TYPES[model]
+    resolver.link_rows(
+        (entity_type, pks[key], source, ext, ext_type)
+        for key, external_ids in links if key in pks
+        for source, ext, ext_type in external_ids
+    )
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+
+@dataclass
+class NormalizeResult:
+    records: int = 0
+    processed: int = 0
+    failed: int = 0
+    upserted: Dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: "NormalizeResult") -> None:
+        self.records += other.records
+        self.processed += other.processed
+        self.failed += other.failed
+        for k, v in other.upserted.items():
+            self.upserted[k] = self.upserted.get(k, 0) + v
+
+    def __str__(self):
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(self.upserted.items())) or "nothing"
+        return f"{self.processed}/{self.records} records normalized ({self.failed} failed); upserted {counts}"
+
+
+class NormalizationEngine:
+    """
+    Reads processed=False RawRecords in keyset-ordered chunks (created_at, id),
+    maps them through registered mappers and bulk-upserts the results. Records
+    whose mapper raises keep processed=False and get processing_error set; the
+    rest are marked processed with one UPDATE per chunk.
+    """
+
+    def __init__(self, chunk_size: int = 1000, source: Optional[str] = None, record_type: Optional[str] = None):
+        self.chunk_size = chunk_size
+        self.source = source
+        self.record_type = record_type
+        self.resolver = ExternalIDResolver()
+
+    def partition_list(self) -> List[Tuple[str, str]]:
+        """Registered (source, record_type) pairs this engine is scoped to."""
+        return [
+            (s, rt) for s, rt in registered_types()
+            if (self.source is None or s == self.source)
+            and (self.record_type is None or rt == self.record_type)
+        ]
+
+    def pending(self) -> models.QuerySet:
+        types = self.partition_list()
+        if not types:
+            return RawRecord.objects.none()
+        by_type = Q()
+        for s, rt in types:
+            by_type |= Q(source=s, record_type=rt)
+        return RawRecord.objects.filter(by_type, processed=False).order_by("created_at", "id")
+
+    def iter_chunks(self) -> Iterable[List[RawRecord]]:
+        qs = self.pending()
+        last: Optional[Tuple[Any, Any]] = None
+        while True:
+            page = qs
+            if last is not None:
+                page = qs.filter(Q(created_at__gt=last[0]) | Q(created_at=last[0], id__gt=last[1]))
+            chunk = list(page[: self.chunk_size])
+            if not chunk:
+                return
+            last = (chunk[-1].created_at, chunk[-1].id)
+            yield chunk
+
+    def map_chunk(self, records: List[RawRecord]) -> Tuple[Dict[Type[models.Model], List[Mapped]], List[RawRecord], List[RawRecord]]:
+        rows: Dict[Type[models.Model], List[Mapped]] = defaultdict(list)
+        ok, failed = [], []
+        hydrate(records)
+        for record in records:
+            try:
+                mapped = list(get_mapper(record.source, record.record_type)(record))
+                for m in mapped:
+                    m.check()  # surface a missing natural key as this record's error
+            except Exception as e:
+                record.processing_error = f"{type(e).__name__}: {e}"
+                failed.append(record)
+                continue
+            for m in mapped:
+                rows[m.model].append(m)
+            ok.append(record)
+        return rows, ok, failed
+
+    def write_chunk(self, rows: Dict[Type[models.Model], List[Mapped]], result: NormalizeResult) -> None:
+        for model in UPSERT_ORDER:
+            if model not in rows:
+                continue
+            values = [dict(m.values) for m in rows[model]]
+            _resolve_refs(values, self.resolver)
+            keyed = [(m, v) for m, v in zip(rows[model], values) if not _is_blank(m.key())]
+            n = bulk_upsert(model, [v for _, v in keyed], batch_size=self.chunk_size)
+            # Bulk upserts skip post_save, so closure rows and search entries are synced here.
+            keys = {m.key() for m, _ in keyed}
+            pks = list(_fetch_ids(model, NATURAL_KEYS[model], keys).values())
+            if len(keyed) < len(values):
+                unkeyed = [(m, v) for m, v in zip(rows[model], values) if _is_blank(m.key())]
+                by_external = upsert_by_external_id(model, unkeyed, self.resolver, batch_size=self.chunk_size)
+                n += len(by_external)
+                pks += by_external
+            if model in HIERARCHIES:
+                sync_nodes(model, pks)
+            _link_external_ids(model, [(m.key(), m.external_ids) for m, _ in keyed if m.external_ids], self.resolver)
+            index_entities(model, pks, chunk_size=self.chunk_size)
+            name = model._meta.model_name
+            result.upserted[name] = result.upserted.get(name, 0) + n
+
+    def mark_processed(self, records: List[RawRecord]) -> None:
+        RawRecord.objects.filter(id__in=[r.id for r in records]).update(
+            processed=True, processing_error="", claim_token=None, claimed_until=None,
+            updated_at=timezone.now(),
+        )
+
+    def mark_failed(self, records: List[RawRecord]) -> None:
+        now = timezone.now()
+        for record in records:
+            record.claim_token = record.claimed_until = None
+            record.updated_at = now
+        RawRecord.objects.bulk_update(
+            records, ["processing_error", "claim_token", "claimed_until", "updated_at"],
+            batch_size=self.chunk_size,
+        )
+
+    def process_one_by_one(self, records: List[RawRecord], result: NormalizeResult) -> Tuple[List[RawRecord], List[RawRecord]]:
+        """Slow path after a failed bulk write: isolate the offending records."""
+        ok, failed = [], []
+        for record in records:
+            rows, _, _ = self.map_chunk([record])
+            try:
+                with transaction.atomic():
+                    self.write_chunk(rows, result)
+                    self.mark_processed([record])
+                ok.append(record)
+            except Exception as e:
+                self.resolver = ExternalIDResolver()
+                record.processing_error = f"{type(e).__name__}: {e}"
+                failed.append(record)
+        return ok, failed
+
+    def process_chunk(self, records: List[RawRecord], result: NormalizeResult) -> None:
+        rows, ok, failed = self.map_chunk(records)
+        try:
+            with transaction.atomic():
+                self.write_chunk(rows, result)
+                self.mark_processed(ok)
+        except Exception:
+            self.resolver = ExternalIDResolver()  # drop ids cached from the rolled-back transaction
+            ok, write_failed = self.process_one_by_one(ok, result)
+            failed += write_failed
+        if failed:
+            self.mark_failed(failed)
+        result.records += len(records)
+        result.processed += len(ok)
+        result.failed += len(failed)
+
+    def run(self) -> NormalizeResult:
+        result = NormalizeResult()
+        for chunk in self.iter_chunks():
+            self.process_chunk(chunk, result)
+        return result
+
+
+class ClaimingNormalizationEngine(NormalizationEngine):
+    """
+    Engine variant for running several workers against the same table. Instead
+    of a keyset scan, each worker claims a batch by stamping claim_token and a
+    lease (claimed_until) on the rows; a crashed worker's rows become claimable
+    again once the lease expires. Records that fail are not re-claimed by the
+    same run, but are retried by the next one.
+    """
+
+    def __init__(self, *args: Any, lease_seconds: int = 300, partitions: Optional[List[Tuple[str, str]]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.partitions = partitions
+        self.started_at = timezone.now()
+
+    def claimable(self, source: str, record_type: str) -> models.QuerySet:
+        now = timezone.now()
+        return RawRecord.objects.filter(
+            Q(claim_token__isnull=True) | Q(claimed_until__lt=now),
+            Q(processing_error="") | Q(updated_at__lt=self.started_at),
+            source=source, record_type=record_type, processed=False,
+        ).order_by("created_at", "id")
+
+    def claim(self, source: str, record_type: str) -> List[RawRecord]:
+        token = uuid.uuid4()
+        with transaction.atomic():
+            # skip_locked lets concurrent workers on Postgres pick disjoint rows;
+            # the guarded UPDATE below still loses cleanly on backends without it.
+            candidates = self.claimable(source, record_type)
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list("id", flat=True)[: self.chunk_size])
+            if not ids:
+                return []
+            self.claimable(source, record_type).filter(id__in=ids).update(
+                claim_token=token, claimed_until=timezone.now() + self.lease,
+            )
+        return list(RawRecord.objects.filter(claim_token=token).order_by("created_at", "id"))
+
+    def iter_chunks(self) -> Iterable[List[RawRecord]]:
+        partitions = self.partitions if self.partitions is not None else self.partition_list()
+        active = list(partitions)
+        while active:
+            for part in list(active):
+                chunk = self.claim(*part)
+                if chunk:
+                    yield chunk
+                else:
+                    active.remove(part)
+
+
+def autodiscover_mappers() -> None:
+    """Import the modules listed in settings.INTELLIGENCE_MAPPER_MODULES so their mappers register."""
+    for module in getattr(settings, "INTELLIGENCE_MAPPER_MODULES", []):
+        import_module(module)
+
+
+def normalize_pending(**kwargs: Any) -> NormalizeResult:
+    return NormalizationEngine(**kwargs).run()
@@ -0,0 +1,121 @@
+"""
+Keyset ("cursor") pagination for large list views.
+
+OFFSET paging reads and discards every row before the page, and the
+paginator's COUNT(*) scans the whole table; both grow with the table. A
+cursor page instead continues from the sort key of the last row shown:
+
+    ORDER BY updated_at DESC, id DESC
+    WHERE updated_at <= :t AND (updated_at < :t OR (updated_at = :t AND id < :id))
+
+so with an index on the ordering columns every page costs the same, however
+deep. Tokens are opaque (urlsafe base64 JSON of the boundary row's key) and
+no count is ever taken: the page fetches one extra row to know whether
+another page follows. Ordering fields must be non-null; the primary key is
+appended as a tiebreaker so keys are unique.
+"""
+from __future__ import annotations
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.db import models
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class CursorPage:
+    object_list: List[models.Model]
+    next_token: Optional[str] = None
+    previous_token: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_token is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_token is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    def __init__(self, queryset: models.QuerySet, per_page: int, ordering: Sequence[str] = ()):
+        self.model = queryset.model
+        pk = self.model._meta.pk.name
+        keys: List[Tuple[str, bool]] = []  # (field, descending)
+        for key in ordering or queryset.query.order_by or (pk,):
+            name, desc = (key[1:], True) if key.startswith("-") else (key, False)
+            keys.append((pk if name == "pk" else name, desc))
+        if keys[-1][0] != pk:
+            keys.append((pk, keys[-1][1]))
+        self.keys = keys
+        self.queryset = queryset
+        self.per_page = per_page
+
+    # ---- tokens ----
+
+    def _encode(self, direction: str, row: models.Model) -> str:
+        values = [self.model._meta.get_field(name).value_to_string(row) for name, _ in self.keys]
+        raw = json.dumps([direction, values], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _decode(self, token: str) -> Tuple[str, List[Any]]:
+        try:
+            direction, values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            if direction not in ("n", "p") or len(values) != len(self.keys):
+                raise InvalidCursor(token)
+            return direction, [self.model._meta.get_field(name).to_python(v) for (name, _), v in zip(self.keys, values)]
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise InvalidCursor(token) from e
+
+    # ---- paging ----
+
+    @staticmethod
+    def _after(keys: Sequence[Tuple[str, bool]], values: Sequence[Any]) -> Q:
+        """Rows strictly after `values` in the order given by `keys`."""
+        name, desc = keys[0]
+        # A plain range on the leading column lets the database seek on its index.
+        bound = Q(**{f"{name}__{'lte' if desc else 'gte'}": values[0]})
+        strictly = Q()
+        equal = Q()
+        for (name, desc), value in zip(keys, values):
+            strictly |= equal & Q(**{f"{name}__{'lt' if desc else 'gt'}": value})
+            equal &= Q(**{name: value})
+        return bound & strictly
+
+    def page(self, token: Optional[str] = None) -> CursorPage:
+        direction, values = self._decode(token) if token else ("n", None)
+        keys = self.keys if direction == "n" else [(name, not desc) for name, desc in self.keys]
+        qs = self.queryset.order_by(*[f"{'-' if desc else ''}{name}" for name, desc in keys])
+        if values is not None:
+            qs = qs.filter(self._after(keys, values))
+        rows = list(qs[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == "p":
+            rows.reverse()
+        page = CursorPage(rows)
+        if rows:
+            if direction == "n":
+                page.next_token = self._encode("n", rows[-1]) if more else None
+                page.previous_token = self._encode("p", rows[0]) if values is not None else None
+            else:
+                page.next_token = self._encode("n", rows[-1])
+                page.previous_token = self._encode("p", rows[0]) if more else None
+        return page
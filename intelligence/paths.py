@@ -0,0 +1,267 @@
+"""
+Cheapest ("shortest attack") paths between two entities.
+
+Each edge costs RELATIONSHIP_COSTS[type] + (1 - confidence), so well-attested
+privileged hops (ADMIN_OF, ASSUMES_ROLE) are cheap and low-confidence
+inferred edges are expensive; override per type with
+settings.INTELLIGENCE_PATH_COSTS. Paths are found with bidirectional Dijkstra
+over the in-memory graph_index.AdjacencyIndex, give up beyond `max_cost`,
+and shortest_paths() returns the K cheapest loopless paths (Yen's algorithm).
+Results are cached (django cache) under the index version, so any graph
+change picked up by the index invalidates them.
+"""
+from __future__ import annotations
+import hashlib
+import heapq
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .graph import DIRECTIONS
+from .graph_index import REL_TYPE_CODES, AdjacencyIndex, get_index, np
+from .models import RelationshipType
+
+Node = Tuple[str, uuid.UUID]
+
+RELATIONSHIP_COSTS = {
+    RelationshipType.ADMIN_OF: 0.1,
+    RelationshipType.ASSUMES_ROLE: 0.2,
+    RelationshipType.MEMBER_OF: 0.2,
+    RelationshipType.HAS_ACCESS_TO: 0.3,
+    RelationshipType.CONNECTED_TO: 0.5,
+    RelationshipType.MANAGES: 0.5,
+    RelationshipType.RUNS_IN: 0.8,
+    RelationshipType.HOSTED_IN: 0.8,
+}
+DEFAULT_COST = 1.0
+CACHE_SECONDS = 600
+# The two search halves add a path's costs in a different order than a
+# left-to-right walk, so the same path can come out an ulp apart.
+COST_TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class PathStep:
+    source: Node
+    relationship_type: str
+    target: Node
+    reverse: bool  # walked against the edge's direction (direction="both" only)
+    cost: float
+
+
+@dataclass(frozen=True)
+class AttackPath:
+    cost: float
+    steps: Tuple[PathStep, ...]
+
+    @property
+    def nodes(self) -> List[Node]:
+        return [self.steps[0].source] + [s.target for s in self.steps] if self.steps else []
+
+    def __len__(self):
+        return len(self.steps)
+
+
+def relationship_costs() -> Dict[str, float]:
+    costs = {t: RELATIONSHIP_COSTS.get(t, DEFAULT_COST) for t in RelationshipType.values}
+    costs.update(getattr(settings, "INTELLIGENCE_PATH_COSTS", {}))
+    return costs
+
+
+def edge_weights(index: AdjacencyIndex) -> "np.ndarray":
+    """Cost of every indexed edge, cached on the index per cost table."""
+    costs = relationship_costs()
+    key = ("path_weights", tuple(sorted(costs.items())))
+    if key not in index.derived:
+        by_code = np.zeros(len(REL_TYPE_CODES), dtype=np.float64)
+        for rel_type, code in REL_TYPE_CODES.items():
+            by_code[code] = costs[rel_type]
+        index.derived[key] = by_code[index._rel] + (1.0 - np.clip(index._conf, 0.0, 1.0))
+    return index.derived[key]
+
+
+# One hop of an internal path: (next node, edge index, walked in reverse).
+Hop = Tuple[int, int, bool]
+
+
+def _adjacency(index: AdjacencyIndex, weights, codes: Optional[frozenset], direction: str, backward: bool):
+    """
+    One merged CSR (offsets, neighbours, edge index, edge cost, walked in
+    reverse) for a search side, so a node's neighbours are a single slice
+    whatever the relationship filter. Cached on the index per query shape.
+    """
+    key = ("path_adjacency", codes, direction, backward, id(weights))
+    if key not in index.derived:
+        edges = np.arange(index.edge_count) if codes is None else np.flatnonzero(np.isin(index._rel, list(codes)))
+        src, dst = index._src[edges], index._dst[edges]
+        walks = {"out": [False], "in": [True], "both": [False, True]}[direction]
+        keys, nbrs, reverse = [], [], []
+        for rev in walks:
+            # Walking an edge forwards goes src -> dst; the backward side runs from the target.
+            tail, head = (dst, src) if rev else (src, dst)
+            if backward:
+                tail, head = head, tail
+            keys.append(tail)
+            nbrs.append(head)
+            reverse.append(np.full(len(edges), rev))
+        keys, nbrs, reverse = np.concatenate(keys), np.concatenate(nbrs), np.concatenate(reverse)
+        all_edges = np.tile(edges, len(walks))
+        order = np.argsort(keys, kind="stable")
+        offsets = np.zeros(index.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=index.node_count), out=offsets[1:])
+        e = all_edges[order]
+        index.derived[key] = (offsets, nbrs[order], e, weights[e], reverse[order])
+    return index.derived[key]
+
+
+class _Search:
+    """Bidirectional Dijkstra over an AdjacencyIndex, with optional banned nodes/edges (for Yen)."""
+
+    def __init__(self, index: AdjacencyIndex, weights, direction: str, relationship_types: Optional[Sequence[str]]):
+        codes = None if not relationship_types else frozenset(REL_TYPE_CODES[t] for t in relationship_types)
+        self.sides = (_adjacency(index, weights, codes, direction, False), _adjacency(index, weights, codes, direction, True))
+        self.weights = weights
+
+    @staticmethod
+    def _neighbours(side, u: int):
+        offsets, nbrs, edges, costs, reverse = side
+        a, b = offsets[u], offsets[u + 1]
+        return zip(nbrs[a:b].tolist(), edges[a:b].tolist(), costs[a:b].tolist(), reverse[a:b].tolist())
+
+    def run(self, s: int, t: int, max_cost: float, banned_nodes: Set[int] = frozenset(),
+            banned_edges: Set[int] = frozenset()) -> Optional[Tuple[float, List[Hop]]]:
+        if s == t:
+            return 0.0, []
+        dist = ({s: 0.0}, {t: 0.0})
+        parent: Tuple[Dict[int, Tuple[int, int, bool]], Dict[int, Tuple[int, int, bool]]] = ({}, {})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        done = (set(), set())
+        best, meet = float("inf"), None
+        while heaps[0] and heaps[1]:
+            frontier = heaps[0][0][0] + heaps[1][0][0]
+            if frontier >= best or frontier > max_cost:  # a path costing exactly max_cost still counts
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            d, u = heapq.heappop(heaps[side])
+            if u in done[side]:
+                continue
+            done[side].add(u)
+            for v, e, w, reverse in self._neighbours(self.sides[side], u):
+                if v in banned_nodes or e in banned_edges:
+                    continue
+                nd = d + w
+                if nd > max_cost or nd >= dist[side].get(v, float("inf")):
+                    continue
+                dist[side][v] = nd
+                parent[side][v] = (u, e, reverse)
+                heapq.heappush(heaps[side], (nd, v))
+                other = dist[1 - side].get(v)
+                if other is not None and nd + other < best:
+                    best, meet = nd + other, v
+        if meet is None or best > max_cost:
+            return None
+        hops: List[Hop] = []
+        v = meet
+        while v != s:  # forward half, walked back to s
+            u, e, reverse = parent[0][v]
+            hops.append((v, e, reverse))
+            v = u
+        hops.reverse()
+        v = meet
+        while v != t:  # backward half, already in travel order
+            u, e, reverse = parent[1][v]
+            hops.append((u, e, reverse))
+            v = u
+        return best, hops
+
+
+def _k_shortest(search: _Search, s: int, t: int, k: int, max_cost: float) -> List[Tuple[float, List[Hop]]]:
+    """Yen's algorithm: the k cheapest loopless s-t paths."""
+    first = search.run(s, t, max_cost)
+    if first is None:
+        return []
+    found = [first]
+    candidates: List[Tuple[float, int, List[Hop]]] = []
+    seen: Set[Tuple[int, ...]] = {tuple(e for _, e, _ in first[1])}
+    counter = 0
+    while len(found) < k:
+        _, prev = found[-1]
+        nodes = [s] + [v for v, _, _ in prev]
+        needed = k - len(found)
+        root_cost = 0.0
+        for i in range(len(prev)):
+            spur, root = nodes[i], prev[:i]
+            if i:
+                root_cost += float(search.weights[prev[i - 1][1]])
+            # A spur path is only useful if it could still beat the needed-th best candidate.
+            limit = max_cost
+            if len(candidates) >= needed:
+                limit = min(limit, heapq.nsmallest(needed, candidates)[-1][0])
+            banned_edges = {p[i][1] for _, p in found if len(p) > i and p[:i] == root}
+            spur_path = search.run(spur, t, limit - root_cost, set(nodes[:i]), banned_edges)
+            if spur_path is None:
+                continue
+            hops = root + spur_path[1]
+            key = tuple(e for _, e, _ in hops)
+            if key not in seen:
+                seen.add(key)
+                counter += 1
+                heapq.heappush(candidates, (root_cost + spur_path[0], counter, hops))
+        if not candidates:
+            break
+        cost, _, hops = heapq.heappop(candidates)
+        found.append((cost, hops))
+    return found
+
+
+def _to_path(index: AdjacencyIndex, weights, s: int, hops: List[Hop]) -> AttackPath:
+    steps, u, cost = [], s, 0.0
+    for v, e, reverse in hops:
+        steps.append(PathStep(index.node(u), RelationshipType.values[index._rel[e]], index.node(v), reverse, float(weights[e])))
+        cost += float(weights[e])
+        u = v
+    return AttackPath(cost, tuple(steps))
+
+
+def shortest_paths(from_type: str, from_id: uuid.UUID, to_type: str, to_id: uuid.UUID, k: int = 1,
+                   direction: str = "out", relationship_types: Optional[Sequence[str]] = None,
+                   max_cost: float = float("inf"), index: Optional[AdjacencyIndex] = None,
+                   use_cache: bool = True) -> List[AttackPath]:
+    """Up to k cheapest paths from one entity to another, cheapest first; [] if none within max_cost."""
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}")
+    index = index or get_index()
+    key = None
+    if use_cache:
+        raw = repr((index.version, from_type, from_id, to_type, to_id, k, direction,
+                    sorted(relationship_types or ()), max_cost, sorted(relationship_costs().items())))
+        key = "intelligence:paths:" + hashlib.sha1(raw.encode()).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    s, t = index.node_id(from_id), index.node_id(to_id)
+    paths: List[AttackPath] = []
+    if s is not None and t is not None:
+        weights = edge_weights(index)
+        search = _Search(index, weights, direction, relationship_types)
+        # Search a hair past max_cost, then cut off on the step-by-step cost.
+        found = (_to_path(index, weights, s, hops) for _, hops in _k_shortest(search, s, t, k, max_cost + COST_TOLERANCE))
+        paths = sorted((path for path in found if path.cost <= max_cost), key=lambda path: path.cost)
+    if key is not None:
+        cache.set(key, paths, CACHE_SECONDS)
+    return paths
+
+
+def warm(index: Optional[AdjacencyIndex] = None, direction: str = "out",
+         relationship_types: Optional[Sequence[str]] = None) -> None:
+    """Build the weight and adjacency arrays for a query shape ahead of the first request."""
+    index = index or get_index()
+    _Search(index, edge_weights(index), direction, relationship_types)
+
+
+def shortest_path(from_type: str, from_id: uuid.UUID, to_type: str, to_id: uuid.UUID, **kwargs) -> Optional[AttackPath]:
+    paths = shortest_paths(from_type, from_id, to_type, to_id, k=1, **kwargs)
+    return paths[0] if paths else None
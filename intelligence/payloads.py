@@ -0,0 +1,98 @@
+"""
+RawRecord payload storage.
+
+With settings.INTELLIGENCE_PAYLOAD_STORAGE = "compressed", ingest stores each
+distinct payload once in PayloadBlob (keyed by RawRecord.content_hash,
+compressed with INTELLIGENCE_PAYLOAD_CODEC) and leaves RawRecord.payload NULL.
+Readers call hydrate()/RawRecord.get_payload() to decompress on demand.
+The default, "inline", keeps the JSON on the RawRecord row as before.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+from .models import PayloadBlob, RawRecord
+
+try:
+    import zstandard
+except ImportError:  # optional, see requirements-optional.txt: "zstd" falls back to zlib
+    zstandard = None
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=10).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "zstd": (_zstd_compress, _zstd_decompress),
+}
+
+
+def canonical_json(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def payload_hash(payload: Dict[str, Any]) -> str:
+    """Stable sha256 of a payload: key order and whitespace don't change the hash."""
+    return hashlib.sha256(canonical_json(payload)).hexdigest()
+
+
+def payload_digest(payload: Dict[str, Any]) -> Tuple[str, int]:
+    """payload_hash() plus the canonical size in bytes, encoding the payload once."""
+    raw = canonical_json(payload)
+    return hashlib.sha256(raw).hexdigest(), len(raw)
+
+
+def compression_enabled() -> bool:
+    return getattr(settings, "INTELLIGENCE_PAYLOAD_STORAGE", "inline") == "compressed"
+
+
+def codec_name() -> str:
+    name = getattr(settings, "INTELLIGENCE_PAYLOAD_CODEC", "zlib")
+    if name == "zstd" and zstandard is None:
+        return "zlib"
+    return name
+
+
+def offload(records: List[RawRecord]) -> int:
+    """
+    Move payloads of unsaved RawRecords into PayloadBlob and clear them on the
+    records. Blobs that already exist are left alone. Returns blobs written.
+    """
+    codec = codec_name()
+    compress = CODECS[codec][0]
+    blobs: Dict[str, PayloadBlob] = {}
+    for r in records:
+        if r.payload is None:
+            continue
+        if r.content_hash not in blobs:
+            raw = canonical_json(r.payload)
+            blobs[r.content_hash] = PayloadBlob(content_hash=r.content_hash, codec=codec, data=compress(raw), size=len(raw))
+        r.payload = None
+    PayloadBlob.objects.bulk_create(list(blobs.values()), batch_size=500, ignore_conflicts=True)
+    return len(blobs)
+
+
+def decode(blob: PayloadBlob) -> Dict[str, Any]:
+    return json.loads(CODECS[blob.codec][1](bytes(blob.data)))
+
+
+def hydrate(records: Iterable[RawRecord]) -> None:
+    """Fill in .payload for records stored compressed, with one query for the whole batch."""
+    pending = [r for r in records if r.payload is None and r.content_hash]
+    if not pending:
+        return
+    blobs = PayloadBlob.objects.in_bulk({r.content_hash for r in pending})
+    for r in pending:
+        blob = blobs.get(r.content_hash)
+        if blob is not None:
+            r.payload = decode(blob)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from .models import ExternalID
+
+Key = Tuple[str, str, str]  # (entity_type, source, external_id)
+
+
+class ExternalIDResolver:
+    """
+    Batch resolver for (source, external_id) -> entity UUID.
+
+    resolve_many() answers a whole batch with one IN query per
+    (entity_type, source) for ids not already cached; ids found are kept in a
+    bounded LRU so later batches in the same run don't hit the database again.
+    Misses are not cached: another batch or process may link the id meanwhile,
+    and a cached miss would make the caller create a second entity for it.
+    link_many() upserts ExternalID rows in bulk on (entity_type, source,
+    external_id), re-pointing ids whose entity changed. Keep one resolver per
+    run: cached hits are not invalidated by writes made elsewhere.
+    """
+
+    def __init__(self, max_size: int = 200_000, query_chunk: int = 5000):
+        self.max_size = max_size
+        self.query_chunk = query_chunk
+        self._cache: "OrderedDict[Key, uuid.UUID]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: Key, value: uuid.UUID) -> None:
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def resolve_many(self, entity_type: str, source: str, external_ids: Iterable[str]) -> Dict[str, uuid.UUID]:
+        found: Dict[str, uuid.UUID] = {}
+        todo = []
+        for ext in set(external_ids):
+            if not ext:
+                continue
+            cached = self._cache.get((entity_type, source, ext), None)
+            if cached is None:
+                todo.append(ext)
+                continue
+            self.hits += 1
+            self._cache.move_to_end((entity_type, source, ext))
+            found[ext] = cached
+
+        self.misses += len(todo)
+        for i in range(0, len(todo), self.query_chunk):
+            part = todo[i:i + self.query_chunk]
+            rows = dict(
+                ExternalID.objects
+                .filter(entity_type=entity_type, source=source, external_id__in=part)
+                .values_list("external_id", "entity_uuid")
+            )
+            for ext, value in rows.items():
+                self._remember((entity_type, source, ext), value)
+                found[ext] = value
+        return found
+
+    def resolve(self, entity_type: str, source: str, external_id: str) -> Optional[uuid.UUID]:
+        return self.resolve_many(entity_type, source, [external_id]).get(external_id)
+
+    def link_many(self, entity_type: str, source: str, mapping: Mapping[str, uuid.UUID],
+                  external_id_type: str = "") -> int:
+        """
+        Ensure each external_id in `mapping` points at its entity_uuid: new ids
+        are inserted and ids mapped to another entity are re-pointed, in one
+        upsert on (entity_type, source, external_id). Returns rows written.
+        """
+        known = self.resolve_many(entity_type, source, mapping)
+        new = {
+            ext: entity_uuid for ext, entity_uuid in mapping.items()
+            if ext and known.get(ext) != entity_uuid
+        }
+        if not new:
+            return 0
+        ExternalID.objects.bulk_create(
+            [
+                ExternalID(
+                    entity_type=entity_type,
+                    entity_uuid=entity_uuid,
+                    source=source,
+                    external_id=ext,
+                    external_id_type=external_id_type,
+                )
+                for ext, entity_uuid in new.items()
+            ],
+            batch_size=self.query_chunk,
+            update_conflicts=True,
+            unique_fields=["entity_type", "source", "external_id"],
+            update_fields=["entity_uuid", "external_id_type", "updated_at"],
+        )
+        for ext, entity_uuid in new.items():
+            self._remember((entity_type, source, ext), entity_uuid)
+        return len(new)
+
+    def link_rows(self, rows: Iterable[Tuple[str, uuid.UUID, str, str, str]]) -> int:
+        """link_many() over mixed (entity_type, entity_uuid, source, external_id, external_id_type) tuples."""
+        grouped: Dict[Tuple[str, str, str], Dict[str, uuid.UUID]] = defaultdict(dict)
+        for entity_type, entity_uuid, source, ext, ext_type in rows:
+            grouped[(entity_type, source, ext_type)][ext] = entity_uuid
+        return sum(
+            self.link_many(entity_type, source, mapping, external_id_type=ext_type)
+            for (entity_type, source, ext_type), mapping in grouped.items()
+        )
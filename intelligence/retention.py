@@ -0,0 +1,167 @@
+"""
+RawRecord retention.
+
+Policy (settings.INTELLIGENCE_RETENTION, all keys optional):
+    keep_runs     -- keep raw records of the last N SyncRuns per source (default 10);
+                     older runs only keep records that are still the newest
+                     payload for their external_id (delta sync skips re-storing them)
+    latest_only   -- after normalization, keep only the newest processed record
+                     per (source, record_type, external_id) (default True)
+    batch_size    -- rows deleted per transaction (default 5000)
+
+Unprocessed records are never pruned. Deletes run in small id batches so the
+table is never locked for long; reclaimed rows/bytes are added to the owning
+SyncRun's records_pruned/bytes_pruned. A record's bytes are its stored
+payload: the inline JSON, or the compressed PayloadBlob it points to. A blob
+shared with records that are kept is not freed with them; PayloadBlobs no
+longer referenced by any RawRecord are removed last (RetentionResult.blobs /
+blob_bytes), so don't run this concurrently with an ingest that uses
+compressed payload storage.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, TextField
+from django.db.models.functions import Cast, Coalesce, Length
+
+from .models import PayloadBlob, RawRecord, SyncRun
+
+DEFAULTS = {
+    "keep_runs": 10,
+    "latest_only": True,
+    "batch_size": 5000,
+}
+
+
+def retention_policy(**overrides: Any) -> Dict[str, Any]:
+    policy = dict(DEFAULTS)
+    policy.update(getattr(settings, "INTELLIGENCE_RETENTION", {}))
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    return policy
+
+
+@dataclass
+class RetentionResult:
+    records: int = 0
+    bytes: int = 0
+    blobs: int = 0
+    blob_bytes: int = 0
+
+    def __str__(self):
+        return (f"Pruned {self.records} raw records ({self.bytes} bytes) "
+                f"and {self.blobs} payload blobs ({self.blob_bytes} bytes)")
+
+
+def expired_runs(keep_runs: int, source: Optional[str] = None) -> List[Any]:
+    """SyncRun ids beyond the newest `keep_runs` for each source."""
+    sources = [source] if source else SyncRun.objects.values_list("source", flat=True).distinct()
+    expired: List[Any] = []
+    for s in sources:
+        expired += list(
+            SyncRun.objects.filter(source=s).order_by("-started_at").values_list("id", flat=True)[keep_runs:]
+        )
+    return expired
+
+
+def superseded() -> Exists:
+    """True for records with a newer processed record for the same (source, record_type, external_id)."""
+    return Exists(RawRecord.objects.filter(
+        source=OuterRef("source"),
+        record_type=OuterRef("record_type"),
+        external_id=OuterRef("external_id"),
+        created_at__gt=OuterRef("created_at"),
+        processed=True,
+    ))
+
+
+def prunable(policy: Dict[str, Any], source: Optional[str] = None):
+    """Processed RawRecords the policy allows deleting, as one queryset."""
+    is_superseded = Q(superseded()) & ~Q(external_id="")
+    cond = Q()
+    old_runs = expired_runs(policy["keep_runs"], source)
+    if old_runs:
+        cond |= Q(sync_run_id__in=old_runs) & (is_superseded | Q(external_id=""))
+    if policy["latest_only"]:
+        cond |= is_superseded
+    if not cond:
+        return RawRecord.objects.none()
+    qs = RawRecord.objects.filter(cond, processed=True)
+    return qs.filter(source=source) if source else qs
+
+
+def _delete_in_batches(qs, batch_size: int, dry_run: bool) -> Iterable[List[Tuple[Any, Any, int]]]:
+    """
+    Yield (id, sync_run_id, payload_bytes) batches from `qs`, deleting each one
+    in its own short transaction. With dry_run nothing is deleted and the
+    queryset is walked by primary key instead.
+    """
+    blob_bytes = PayloadBlob.objects.filter(pk=OuterRef("content_hash")).annotate(n=Length("data")).values("n")[:1]
+    rows = qs.annotate(
+        nbytes=Coalesce(Length(Cast("payload", TextField())), Subquery(blob_bytes), 0)
+    ).order_by("id")
+    last = None
+    while True:
+        page = rows.filter(id__gt=last) if dry_run and last is not None else rows
+        batch = list(page.values_list("id", "sync_run_id", "nbytes")[:batch_size])
+        if not batch:
+            return
+        if dry_run:
+            last = batch[-1][0]
+        else:
+            with transaction.atomic():
+                RawRecord.objects.filter(id__in=[row[0] for row in batch]).delete()
+        yield batch
+
+
+def _record_on_runs(per_run: Dict[Any, List[int]]) -> None:
+    for run_id, (n, nbytes) in per_run.items():
+        if run_id is not None:
+            SyncRun.objects.filter(id=run_id).update(
+                records_pruned=F("records_pruned") + n,
+                bytes_pruned=F("bytes_pruned") + nbytes,
+            )
+
+
+def prune_orphan_blobs(batch_size: int, dry_run: bool = False) -> Tuple[int, int]:
+    orphans = (
+        PayloadBlob.objects
+        .filter(~Exists(RawRecord.objects.filter(content_hash=OuterRef("pk"))))
+        .annotate(nbytes=Length("data"))
+        .order_by("pk")
+    )
+    count = nbytes = 0
+    last = None
+    while True:
+        page = orphans.filter(pk__gt=last) if last is not None else orphans
+        batch = list(page.values_list("pk", "nbytes")[:batch_size])
+        if not batch:
+            return count, nbytes
+        last = batch[-1][0]
+        if not dry_run:
+            with transaction.atomic():
+                PayloadBlob.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+        count += len(batch)
+        nbytes += sum(n or 0 for _, n in batch)
+
+
+def apply_retention(source: Optional[str] = None, dry_run: bool = False, **overrides: Any) -> RetentionResult:
+    policy = retention_policy(**overrides)
+    batch_size = policy["batch_size"]
+    result = RetentionResult()
+    per_run: Dict[Any, List[int]] = defaultdict(lambda: [0, 0])
+
+    for batch in _delete_in_batches(prunable(policy, source), batch_size, dry_run):
+        for _, run_id, nbytes in batch:
+            per_run[run_id][0] += 1
+            per_run[run_id][1] += nbytes
+        result.records += len(batch)
+        result.bytes += sum(nbytes for _, _, nbytes in batch)
+
+    if not dry_run:
+        _record_on_runs(per_run)
+    result.blobs, result.blob_bytes = prune_orphan_blobs(batch_size, dry_run)
+    return result
@@ -0,0 +1,167 @@
+"""
+Connector scheduler.
+
+Runs every enabled registered connector (see connectors.registry) on a thread
+pool, in priority order, with a cap on concurrent runs per source. The calling
+thread dispatches: a job only goes to the pool once its source has a free slot,
+so connectors waiting on a busy source never tie up worker threads, and each
+pool task is a single attempt. A failed attempt goes back to the queue with
+exponential backoff, releasing its source slot and thread while it waits. A DB
+lease per connector, held from the first attempt to the last, keeps two
+schedulers from running the same connector at once. Exceptions raised by a
+connector are recorded on its ScheduledResult instead of aborting the run.
+"""
+from __future__ import annotations
+import os
+import random
+import socket
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .connectors.base import BaseConnector, ConnectorConfig
+from .connectors.registry import autodiscover_connectors, registered_connectors
+from .models import ConnectorLease, SyncRun
+
+Job = Tuple[str, Type[BaseConnector], ConnectorConfig]
+
+
+@dataclass
+class ScheduledResult:
+    name: str
+    source: str
+    runs: List[SyncRun] = field(default_factory=list)
+    skipped: str = ""
+    attempts: int = 0
+    error: str = ""  # exception raised by the last attempt (or by normalize after it)
+
+    @property
+    def success(self) -> bool:
+        return bool(self.runs) and self.runs[-1].success and not self.error
+
+    def __str__(self):
+        if self.skipped:
+            return f"{self.name}: skipped ({self.skipped})"
+        state = "ok" if self.success else "FAILED"
+        error = f": {self.error}" if self.error else ""
+        return f"{self.name}: {state} after {self.attempts} attempt(s){error}"
+
+
+class ConnectorScheduler:
+    def __init__(self, max_workers: int = 4, per_source_limit: int = 1, max_retries: int = 3,
+                 backoff_base: float = 30.0, backoff_max: float = 900.0, lease_seconds: int = 6 * 3600,
+                 normalize: bool = False, sleep: Callable[[float], None] = time.sleep):
+        self.max_workers = max_workers
+        self.per_source_limit = per_source_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = timedelta(seconds=lease_seconds)
+        self.normalize = normalize
+        self.sleep = sleep
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # ---- leases ----
+
+    def acquire(self, name: str) -> bool:
+        now = timezone.now()
+        ConnectorLease.objects.filter(name=name, expires_at__lt=now).delete()
+        try:
+            with transaction.atomic():
+                ConnectorLease.objects.create(name=name, holder=self.holder, acquired_at=now, expires_at=now + self.lease)
+            return True
+        except IntegrityError:
+            return False
+
+    def release(self, name: str) -> None:
+        ConnectorLease.objects.filter(name=name, holder=self.holder).delete()
+
+    # ---- running ----
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with +/-20% jitter for retry number `attempt` (1-based)."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def attempt(self, cls: Type[BaseConnector], config: ConnectorConfig, result: ScheduledResult) -> bool:
+        """One ingest (plus normalize) on a pool thread; True when the connector is done."""
+        result.error = ""
+        try:
+            connector = cls(config)
+            run = connector.ingest()
+            result.runs.append(run)
+            if not run.success:
+                return False
+            if self.normalize:
+                try:
+                    connector.normalize()
+                except Exception as e:  # the ingest stands; don't re-run it
+                    result.error = f"normalize: {type(e).__name__}: {e}"
+            return True
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            return False
+        finally:
+            connections.close_all()  # this worker thread's connections only
+
+    def run(self, names: Optional[Iterable[str]] = None) -> List[ScheduledResult]:
+        autodiscover_connectors()
+        wanted = set(names) if names else None
+        return self.run_jobs([
+            (name, cls, config) for name, cls, config in registered_connectors()
+            if config.enabled and (wanted is None or name in wanted)
+        ])
+
+    def run_jobs(self, jobs: List[Job]) -> List[ScheduledResult]:
+        """Run `jobs` (in priority order) to completion; one ScheduledResult per job, in the same order."""
+        results = [ScheduledResult(name=name, source=config.source) for name, _, config in jobs]
+        waiting: List[Tuple[int, float]] = [(i, 0.0) for i in range(len(jobs))]  # (job index, ready at)
+        running: Dict[Future, int] = {}
+        busy: Counter = Counter()  # running attempts per source
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="connector") as pool:
+            while waiting or running:
+                now = time.monotonic()
+                for item in list(waiting):
+                    if len(running) >= self.max_workers:
+                        break
+                    i, ready_at = item
+                    name, cls, config = jobs[i]
+                    if ready_at > now or busy[config.source] >= self.per_source_limit:
+                        continue
+                    waiting.remove(item)
+                    if results[i].attempts == 0 and not self.acquire(name):
+                        results[i].skipped = "already running"
+                        continue
+                    results[i].attempts += 1
+                    busy[config.source] += 1
+                    running[pool.submit(self.attempt, cls, config, results[i])] = i
+
+                if running:
+                    later = [ready_at for _, ready_at in waiting if ready_at > now]
+                    timeout = max(0.0, min(later) - now) if later else None
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i = running.pop(future)
+                        name, _, config = jobs[i]
+                        busy[config.source] -= 1
+                        if future.result() or results[i].attempts > self.max_retries:
+                            self.release(name)
+                        else:
+                            waiting.append((i, time.monotonic() + self.backoff(results[i].attempts)))
+                            waiting.sort()  # keep priority order
+                elif waiting:
+                    # Nothing running: sleep until the earliest retry is due, then run it.
+                    first = min(waiting, key=lambda item: item[1])
+                    delay = first[1] - time.monotonic()
+                    if delay > 0:
+                        self.sleep(delay)
+                    waiting[waiting.index(first)] = (first[0], 0.0)
+        return results
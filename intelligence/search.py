@@ -0,0 +1,219 @@
+"""
+Global full-text search over the inventory.
+
+SearchEntry holds one row per entity: its display name as `title` and its
+other searchable fields (SEARCH_FIELDS) plus external IDs as `text`. The
+full-text index over them is created by migration 0016 for the backend in use:
+
+    sqlite      FTS5 external-content table intelligence_searchentry_fts,
+                kept in step with SearchEntry by triggers; ranked by bm25()
+    postgresql  generated tsvector column `document` with a GIN index;
+                ranked by ts_rank_cd()
+
+Other backends fall back to icontains over SearchEntry. Every query term is
+a prefix match and all terms must match; punctuation splits terms on both
+backends, so "j.doe@example" finds j.doe@example.com.
+
+Ranking every match of a common term ("prod" in a million descriptions)
+would cost far more than finding them, so only a bounded candidate set is
+ranked: up to settings.INTELLIGENCE_SEARCH_CANDIDATES (default 500) of the
+newest entries matching anywhere plus as many matching in the title (the
+best ranked, on PostgreSQL), so an entity *named* like the query is not
+crowded out.
+
+Entries are kept current by post_save/post_delete signals on the models of
+SEARCH_FIELDS (see signals.py)
+and by the normalization engine after bulk upserts, which bypass signals.
+rebuild() recomputes every entry (manage.py rebuild_search_index).
+"""
+from __future__ import annotations
+import re
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Asset, BusinessService, EntityType, Environment, ExternalID, Group, Identity, Location,
+    MODEL_ENTITY_TYPES, SearchEntry, Team,
+)
+from .names import DISPLAY_FIELDS, detail_url
+
+# Indexed fields besides the display name (which always is).
+SEARCH_FIELDS: Dict[Type[models.Model], Tuple[str, ...]] = {
+    Asset: ("name", "description"),
+    Identity: ("username", "display_name", "email"),
+    Group: ("name", "description"),
+    Environment: ("name", "description", "region"),
+    Location: ("name", "description", "city", "country"),
+    Team: ("name", "description"),
+    BusinessService: ("name", "description"),
+}
+
+FTS_TABLE = "intelligence_searchentry_fts"
+TITLE_WEIGHT = 10.0  # bm25 column weight of `title` against 1.0 for `text` (sqlite)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    entity_type: str
+    entity_id: uuid.UUID
+    title: str
+    rank: float  # higher is better
+
+    @property
+    def url(self) -> str:
+        return detail_url(self.entity_type, self.entity_id)
+
+    @property
+    def type_label(self) -> str:
+        return EntityType(self.entity_type).label
+
+
+# ---- indexing ----
+
+def _entries(model: Type[models.Model], ids: Sequence[Any]) -> Dict[uuid.UUID, Tuple[str, str]]:
+    """(title, text) for each existing entity of `ids`."""
+    entity_type = MODEL_ENTITY_TYPES[model]
+    fields = SEARCH_FIELDS[model]
+    external = defaultdict(list)
+    for entity_id, external_id in (ExternalID.objects.filter(entity_type=entity_type, entity_uuid__in=ids)
+                                   .order_by("external_id").values_list("entity_uuid", "external_id")):
+        external[entity_id].append(external_id)
+    entries = {}
+    for obj in model.objects.filter(pk__in=ids).only(*{*DISPLAY_FIELDS[model], *fields}):
+        title = str(obj)
+        parts = [v for v in (getattr(obj, f) for f in fields) if v and v not in title]
+        entries[obj.pk] = (title[:300], " ".join(parts + external[obj.pk]))
+    return entries
+
+
+def index_entities(model: Type[models.Model], ids: Iterable[Any], chunk_size: int = 1000) -> int:
+    """
+    Bring the entries of `ids` (pks of `model`) in line with the entities:
+    changed ones are rewritten, those of deleted entities removed, unchanged
+    ones left alone so the full-text index is not churned. Returns rows written.
+    """
+    entity_type = MODEL_ENTITY_TYPES[model]
+    ids = list(dict.fromkeys(ids))
+    written = 0
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        wanted = _entries(model, chunk)
+        current = {
+            entity_id: (title, text)
+            for entity_id, title, text in SearchEntry.objects.filter(entity_type=entity_type, entity_id__in=chunk)
+            .values_list("entity_id", "title", "text")
+        }
+        now = timezone.now()
+        changed = [
+            SearchEntry(entity_type=entity_type, entity_id=pk, title=title, text=text, updated_at=now)
+            for pk, (title, text) in wanted.items() if current.get(pk) != (title, text)
+        ]
+        gone = [pk for pk in current if pk not in wanted]
+        with transaction.atomic():
+            if changed:
+                SearchEntry.objects.bulk_create(
+                    changed, update_conflicts=True, unique_fields=["entity_type", "entity_id"],
+                    update_fields=["title", "text", "updated_at"],
+                )
+            if gone:
+                SearchEntry.objects.filter(entity_type=entity_type, entity_id__in=gone).delete()
+        written += len(changed) + len(gone)
+    return written
+
+
+def remove_entities(entity_type: str, ids: Iterable[Any]) -> int:
+    return SearchEntry.objects.filter(entity_type=entity_type, entity_id__in=list(ids)).delete()[0]
+
+
+def rebuild(chunk_size: int = 5000) -> int:
+    """
+    Recompute every entry from the entity tables (and, on SQLite, the FTS5
+    table from the entries). Returns entries written.
+    """
+    written = 0
+    for model in SEARCH_FIELDS:
+        entity_type = MODEL_ENTITY_TYPES[model]
+        SearchEntry.objects.filter(entity_type=entity_type).exclude(
+            entity_id__in=model.objects.values("pk")).delete()
+        written += index_entities(model, model.objects.values_list("pk", flat=True).iterator(chunk_size=chunk_size),
+                                  chunk_size=chunk_size)
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return written
+
+
+# ---- querying ----
+
+def _terms(query: str) -> List[str]:
+    """Alphanumeric runs of `query`, lowercased: the unit both full-text indexes tokenize by."""
+    return re.findall(r"[^\W_]+", query.lower())
+
+
+def _search_sqlite(terms: List[str], entity_types: Optional[Sequence[str]], limit: int, candidates: int) -> List[Tuple]:
+    match = " AND ".join(f'"{t}"*' for t in terms)
+    types = " OR ".join(f'"{t}"' for t in entity_types or ())
+    only = f" AND entity_type : ({types})" if types else ""
+    fts = FTS_TABLE
+    # bm25() is evaluated lazily, so the inner LIMITs bound the ranking work.
+    branch = (f"SELECT * FROM (SELECT rowid AS id, -bm25({fts}, %s, 1.0, 0.0) AS rank FROM {fts} "
+              f"WHERE {fts} MATCH %s ORDER BY rowid DESC LIMIT %s)")
+    entries = connection.ops.quote_name(SearchEntry._meta.db_table)
+    sql = (f"SELECT e.entity_type, e.entity_id, e.title, c.rank FROM "
+           f"(SELECT id, MAX(rank) AS rank FROM ({branch} UNION ALL {branch}) GROUP BY id) c "
+           f"JOIN {entries} e ON e.id = c.id ORDER BY c.rank DESC, e.title LIMIT %s")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [TITLE_WEIGHT, f"title : ({match}){only}", candidates,
+                             TITLE_WEIGHT, f"{{title text}} : ({match}){only}", candidates, limit])
+        return cursor.fetchall()
+
+
+def _search_postgresql(terms: List[str], entity_types: Optional[Sequence[str]], limit: int, candidates: int) -> List[Tuple]:
+    only, params = "", []
+    if entity_types:
+        only, params = " AND entity_type = ANY(%s)", [list(entity_types)]
+    # Lexemes weighted A come from the title. Each branch is ordered before its LIMIT, so the
+    # candidates are the same on every run: title matches best ranked first (few enough to rank
+    # them all), matches anywhere newest first, as on SQLite.
+    branch = (f"(SELECT id, ts_rank_cd(document, to_tsquery('simple', %s)) AS rank FROM {{entries}} "
+              f"WHERE document @@ to_tsquery('simple', %s){only} ORDER BY {{order}} LIMIT %s)")
+    entries = connection.ops.quote_name(SearchEntry._meta.db_table)
+    sql = (f"SELECT e.entity_type, e.entity_id, e.title, c.rank FROM "
+           f"({branch.format(entries=entries, order='rank DESC, id DESC')} UNION "
+           f"{branch.format(entries=entries, order='id DESC')}) c "
+           f"JOIN {entries} e ON e.id = c.id ORDER BY c.rank DESC, e.title LIMIT %s")
+    everywhere = " & ".join(f"{t}:*" for t in terms)
+    in_title = " & ".join(f"{t}:*A" for t in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [everywhere, in_title, *params, candidates, everywhere, everywhere, *params, candidates, limit])
+        return cursor.fetchall()
+
+
+def _search_fallback(terms: List[str], entity_types: Optional[Sequence[str]], limit: int, candidates: int) -> List[Tuple]:
+    qs = SearchEntry.objects.all()
+    for t in terms:
+        qs = qs.filter(Q(title__icontains=t) | Q(text__icontains=t))
+    if entity_types:
+        qs = qs.filter(entity_type__in=entity_types)
+    return [(*row, 0.0) for row in qs.order_by("title").values_list("entity_type", "entity_id", "title")[:limit]]
+
+
+BACKENDS = {"sqlite": _search_sqlite, "postgresql": _search_postgresql}
+
+
+def search(query: str, entity_types: Optional[Sequence[str]] = None, limit: int = 50) -> List[SearchHit]:
+    """Entities matching every term of `query` (as prefixes), best first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    candidates = max(getattr(settings, "INTELLIGENCE_SEARCH_CANDIDATES", 500), limit)
+    rows = BACKENDS.get(connection.vendor, _search_fallback)(terms, entity_types, limit, candidates)
+    to_uuid = SearchEntry._meta.get_field("entity_id").to_python
+    return [SearchHit(entity_type, to_uuid(entity_id), title, rank) for entity_type, entity_id, title, rank in rows]
@@ -0,0 +1,71 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .access import refresh_identities
+from .hierarchy import HIERARCHIES, check_parent, detach_subtree, sync_nodes
+from .models import ENTITY_MODELS, MODEL_ENTITY_TYPES, Environment, ExternalID, Group, Team
+from .search import SEARCH_FIELDS, index_entities, remove_entities
+
+
+@receiver(pre_save, sender=Team)
+@receiver(pre_save, sender=Environment)
+def reject_cycle(sender, instance, raw=False, **kwargs):
+    # Backstop for saves that skip full_clean() (shell, scripts); forms get the error from Model.clean().
+    if not raw:
+        check_parent(sender, instance.pk, getattr(instance, HIERARCHIES[sender].parent_attname))
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Environment)
+def sync_closure(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_nodes(sender, [instance.pk])
+
+
+@receiver(pre_delete, sender=Team)
+@receiver(pre_delete, sender=Environment)
+def detach_closure(sender, instance, **kwargs):
+    detach_subtree(sender, instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def refresh_member_access(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse: instance is an Identity (identity.groups.add(...)), else a Group.
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_identities([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_members = list(instance.members.values_list("pk", flat=True))
+    elif action == "post_clear":
+        refresh_identities(getattr(instance, "_cleared_members", []))
+    elif action in ("post_add", "post_remove"):
+        refresh_identities(pk_set)
+
+
+# Deleted EntityRelationships refresh access per batch in their QuerySet.delete(), not
+# here: a post_delete receiver would cost them fast delete and refresh once per row.
+
+
+def index_entity(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_entities(sender, [instance.pk])
+
+
+def unindex_entity(sender, instance, **kwargs):
+    remove_entities(MODEL_ENTITY_TYPES[sender], [instance.pk])
+
+
+# Connected per indexed model: without a sender they would run on every save, and
+# a post_delete receiver for every model costs every model Django's fast delete.
+for model in SEARCH_FIELDS:
+    post_save.connect(index_entity, sender=model)
+    post_delete.connect(unindex_entity, sender=model)
+
+
+# Not on delete: it would cost integrity.delete_orphans() its fast delete. Entries
+# of deleted entities go with the entity, or with check_integrity --delete.
+@receiver(post_save, sender=ExternalID)
+def reindex_external_id_owner(sender, instance, raw=False, **kwargs):
+    model = ENTITY_MODELS.get(instance.entity_type)
+    if not raw and model is not None:
+        index_entities(model, [instance.entity_uuid])
@@ -40,6 +40,13 @@ urlpatterns = [
     # Relationships
     path("relationships/", views.RelationshipList.as_view(), name="relationship_list"),
 
+    # Graph
+    path("graph/<str:entity_type>/<uuid:pk>/blast-radius/", views.BlastRadius.as_view(), name="blast_radius"),
+    path("graph/<str:entity_type>/<uuid:pk>/paths/", views.AttackPaths.as_view(), name="attack_paths"),
+
+    # Search
+    path("search/", views.Search.as_view(), name="search"),
+
     # Sync runs
     path("sync-runs/", views.SyncRunList.as_view(), name="syncrun_list"),
 ]
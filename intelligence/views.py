@@ -1,10 +1,24 @@
+import uuid
+
+from django.http import Http404
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.text import slugify
 from django.views.generic import ListView, DetailView, TemplateView, CreateView
 from .models import (
     Asset, Identity, Group, Environment, Location,
-    BusinessService, Team, EntityRelationship, SyncRun
+    BusinessService, Team, EntityRelationship, SyncRun, IntegrityScan,
+    EntityType, RelationshipType, ENTITY_MODELS,
 )
 from .forms import AssetForm, IdentityForm, LocationForm
+from .facets import Facet, apply as apply_facets, facet_counts, selected_values
+from .graph import DIRECTIONS, blast_radius
+from .hierarchy import ancestors, descendants, subtree
+from .names import EntityNameResolver
+from .pagination import CursorPaginator, InvalidCursor
+from .paths import shortest_paths
+from .search import search
+from .streaming import FORMATS as EXPORT_FORMATS, chunks, export_response
 
 
 # ---------------------------
@@ -13,78 +27,282 @@ from .forms import AssetForm, IdentityForm, LocationForm
 class IntelligenceDashboard(TemplateView):
     template_name = "intelligence/dashboard.html"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["integrity"] = IntegrityScan.objects.order_by("-started_at").first()
+        return ctx
+
 
 # ---------------------------
 # ListView base w/ headers
 # ---------------------------
 class ListWithHeaders(ListView):
     headers = []
+    # Relations the row template renders; joined into the page query instead of one query per row.
+    select_related = ()
+    # Keyset pages (?cursor=<token>) over `ordering` + pk instead of OFFSET pages and COUNT(*).
+    cursor_pagination = False
+    # ?export=csv|ndjson streams every row matching the current filters, not just the page:
+    # (column, values() path) pairs, related fields joined into the one export query.
+    export_columns = ()
+    export_chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get("export")
+        if fmt is None or not self.export_columns:
+            return super().get(request, *args, **kwargs)
+        if fmt not in EXPORT_FORMATS:
+            raise Http404("Unknown export format")
+        columns = self.get_export_columns()
+        return export_response(fmt, [name for name, _ in columns], self.export_rows(columns), self.export_filename(fmt))
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        return qs.select_related(*self.select_related) if self.select_related else qs
+
+    def get_export_columns(self):
+        return self.export_columns
+
+    def export_rows(self, columns):
+        qs = self.get_queryset().values_list(*[path for _, path in columns])
+        return qs.iterator(chunk_size=self.export_chunk_size)
+
+    def export_filename(self, fmt):
+        return f"{slugify(self.model._meta.verbose_name_plural)}-{timezone.localdate():%Y%m%d}.{fmt}"
+
+    def export_query(self, fmt, **params):
+        query = self.request.GET.copy()
+        query.pop("page", None)
+        query.pop("cursor", None)
+        query["export"] = fmt
+        for key, value in params.items():
+            query[key] = value
+        return query.urlencode()
+
+    def export_links(self):
+        """(label, querystring) pairs for the list header."""
+        return [(fmt.upper(), self.export_query(fmt)) for fmt in EXPORT_FORMATS] if self.export_columns else []
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.get_ordering() or ())
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return paginator, page, page.object_list, page.has_other_pages
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["headers"] = self.headers
+        ctx["cursor_pagination"] = self.cursor_pagination
+        ctx["exports"] = self.export_links()
+        return ctx
+
+
+class SubtreeFilterMixin:
+    """
+    ?team=<id> / ?environment=<id> filters that match the whole subtree
+    through the closure tables: one indexed subquery, whatever the depth.
+    """
+    subtree_filters = {}  # GET param -> (lookup field, hierarchy model)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        for param, (field, model) in self.subtree_filters.items():
+            value = self.request.GET.get(param)
+            if not value:
+                continue
+            try:
+                pk = uuid.UUID(value)
+            except ValueError:
+                return qs.none()
+            qs = qs.filter(**{f"{field}__in": subtree(model, pk)})
+        return qs
+
+
+class FacetFilterMixin:
+    """
+    ?<field>=<value> facet filters with counts (see facets.py). List it first
+    so counts see the queryset after every other filter but before facets.
+    """
+    facets = ()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        self.selected_facets = selected_values(qs.model, self.facets, self.request.GET)
+        self.unfaceted_queryset = qs
+        return apply_facets(qs, self.selected_facets)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["facets"] = facet_counts(self.unfaceted_queryset, self.facets, self.selected_facets, self.request.GET)
         return ctx
 
 
 # ---- Lists ----
-class AssetList(ListWithHeaders):
+class AssetList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = Asset
+    subtree_filters = {"team": ("owner_team", Team), "environment": ("environment", Environment)}
     template_name = "intelligence/asset_list.html"
     paginate_by = 50
     ordering = ["type", "name"]
     headers = ["Name", "Type", "Criticality", "Data Class", "Owner Team",
                "Environment", "Location", "State", "Updated"]
-
-
-class IdentityList(ListWithHeaders):
+    facets = (
+        Facet("type", "Type"),
+        Facet("criticality", "Criticality"),
+        Facet("data_classification", "Data class"),
+        Facet("lifecycle_state", "State"),
+        Facet("owner_team", "Owner team"),
+    )
+    select_related = ("owner_team", "environment", "location")
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("type", "type"), ("criticality", "criticality"),
+        ("data_classification", "data_classification"), ("owner_team", "owner_team__name"),
+        ("owner_person", "owner_person__username"), ("environment", "environment__name"),
+        ("location", "location__name"), ("business_service", "business_service__name"),
+        ("lifecycle_state", "lifecycle_state"), ("last_seen_at", "last_seen_at"), ("updated_at", "updated_at"),
+    )
+
+
+class IdentityList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = Identity
+    subtree_filters = {"team": ("owner_team", Team)}
     template_name = "intelligence/identity_list.html"
     paginate_by = 50
     ordering = ["type", "display_name", "username"]
     headers = ["Name", "Username", "Email", "Type", "Status",
                "Owner Team", "Last Login", "Updated"]
-
-
-class GroupList(ListWithHeaders):
+    facets = (
+        Facet("type", "Type"),
+        Facet("status", "Status"),
+        Facet("lifecycle_state", "State"),
+        Facet("owner_team", "Owner team"),
+    )
+    select_related = ("owner_team",)
+    export_columns = (
+        ("id", "id"), ("display_name", "display_name"), ("username", "username"), ("email", "email"),
+        ("type", "type"), ("status", "status"), ("owner_team", "owner_team__name"),
+        ("manager", "manager_identity__username"), ("last_login_at", "last_login_at"),
+        ("lifecycle_state", "lifecycle_state"), ("updated_at", "updated_at"),
+    )
+
+
+class GroupList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = Group
+    subtree_filters = {"team": ("owner_team", Team)}
     template_name = "intelligence/group_list.html"
     paginate_by = 50
     ordering = ["type", "name"]
     headers = ["Name", "Type", "Owner Team", "State", "Updated"]
-
-
-class EnvironmentList(ListWithHeaders):
+    facets = (
+        Facet("type", "Type"),
+        Facet("lifecycle_state", "State"),
+        Facet("owner_team", "Owner team"),
+    )
+    select_related = ("owner_team",)
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("type", "type"), ("owner_team", "owner_team__name"),
+        ("lifecycle_state", "lifecycle_state"), ("updated_at", "updated_at"),
+    )
+    # ?export=<fmt>&rows=members: one row per membership of the listed groups.
+    member_export_columns = (
+        ("group_id", "group_id"), ("group", "group__name"), ("group_type", "group__type"),
+        ("identity_id", "identity_id"), ("username", "identity__username"),
+        ("display_name", "identity__display_name"), ("email", "identity__email"),
+        ("status", "identity__status"),
+    )
+
+    def exporting_members(self):
+        return self.request.GET.get("rows") == "members"
+
+    def get_export_columns(self):
+        return self.member_export_columns if self.exporting_members() else super().get_export_columns()
+
+    def export_rows(self, columns):
+        if not self.exporting_members():
+            return super().export_rows(columns)
+        memberships = (Group.members.through.objects.filter(group__in=self.get_queryset().values("pk"))
+                       .order_by("group_id", "identity_id").values_list(*[path for _, path in columns]))
+        return memberships.iterator(chunk_size=self.export_chunk_size)
+
+    def export_filename(self, fmt):
+        name = super().export_filename(fmt)
+        return f"memberships-{name}" if self.exporting_members() else name
+
+    def export_links(self):
+        return super().export_links() + [
+            (f"Members {fmt.upper()}", self.export_query(fmt, rows="members")) for fmt in EXPORT_FORMATS
+        ]
+
+
+class EnvironmentList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = Environment
+    subtree_filters = {"team": ("owner_team", Team), "environment": ("pk", Environment)}
     template_name = "intelligence/environment_list.html"
     paginate_by = 50
     ordering = ["type", "name"]
     headers = ["Name", "Type", "Region", "Network Zone", "Owner Team",
                "Criticality", "State", "Updated"]
-
-
-class LocationList(ListWithHeaders):
+    facets = (
+        Facet("type", "Type"),
+        Facet("criticality", "Criticality"),
+        Facet("lifecycle_state", "State"),
+        Facet("owner_team", "Owner team"),
+    )
+    select_related = ("owner_team",)
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("type", "type"), ("region", "region"),
+        ("network_zone", "network_zone"), ("parent", "parent_environment__name"),
+        ("owner_team", "owner_team__name"), ("criticality", "criticality"),
+        ("lifecycle_state", "lifecycle_state"), ("updated_at", "updated_at"),
+    )
+
+
+class LocationList(FacetFilterMixin, ListWithHeaders):
     model = Location
     template_name = "intelligence/location_list.html"
     paginate_by = 50
     ordering = ["type", "name"]
     headers = ["Name", "Type", "City", "State/Region", "Country",
                "Tier", "State", "Updated"]
+    facets = (Facet("type", "Type"), Facet("tier", "Tier"), Facet("lifecycle_state", "State"))
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("type", "type"), ("city", "city"), ("state_region", "state_region"),
+        ("country", "country"), ("tier", "tier"), ("lifecycle_state", "lifecycle_state"), ("updated_at", "updated_at"),
+    )
 
 
-class BusinessServiceList(ListWithHeaders):
+class BusinessServiceList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = BusinessService
+    subtree_filters = {"team": ("owner_team", Team)}
     template_name = "intelligence/businessservice_list.html"
     paginate_by = 50
     ordering = ["name"]
     headers = ["Name", "Owner Team", "Criticality", "Updated"]
+    facets = (Facet("criticality", "Criticality"), Facet("owner_team", "Owner team"))
+    select_related = ("owner_team",)
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("owner_team", "owner_team__name"),
+        ("criticality", "criticality"), ("updated_at", "updated_at"),
+    )
 
 
-class TeamList(ListWithHeaders):
+class TeamList(FacetFilterMixin, SubtreeFilterMixin, ListWithHeaders):
     model = Team
+    subtree_filters = {"team": ("pk", Team)}
     template_name = "intelligence/team_list.html"
     paginate_by = 50
     ordering = ["name"]
     headers = ["Name", "Parent Team", "Criticality", "Updated"]
+    facets = (Facet("criticality", "Criticality"),)
+    select_related = ("parent_team",)
+    export_columns = (
+        ("id", "id"), ("name", "name"), ("parent", "parent_team__name"),
+        ("criticality", "criticality"), ("updated_at", "updated_at"),
+    )
 
 
 class RelationshipList(ListWithHeaders):
@@ -92,8 +310,31 @@ class RelationshipList(ListWithHeaders):
     template_name = "intelligence/relationship_list.html"
     paginate_by = 100
     ordering = ["-updated_at"]
-    headers = ["From Type", "From ID", "Relationship", "To Type",
-               "To ID", "Source", "Confidence", "Updated"]
+    cursor_pagination = True
+    headers = ["From Type", "From", "Relationship", "To Type",
+               "To", "Source", "Confidence", "Updated"]
+    # *_name columns (path None) are filled in by export_rows().
+    export_columns = (
+        ("id", "id"), ("from_type", "from_entity_type"), ("from_id", "from_entity_id"), ("from_name", None),
+        ("relationship", "relationship_type"), ("to_type", "to_entity_type"), ("to_id", "to_entity_id"),
+        ("to_name", None), ("source", "source"), ("confidence", "confidence"), ("updated_at", "updated_at"),
+    )
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        EntityNameResolver().annotate_edges(ctx["object_list"])
+        return ctx
+
+    def export_rows(self, columns):
+        stored = [path for _, path in columns if path]
+        rows = self.get_queryset().values_list(*stored).iterator(chunk_size=self.export_chunk_size)
+        for chunk in chunks(rows, self.export_chunk_size):
+            # A resolver per chunk keeps memory flat; one query per entity type per chunk.
+            refs = EntityNameResolver(chunk_size=2 * self.export_chunk_size).resolve_many(
+                [(r[1], r[2]) for r in chunk] + [(r[4], r[5]) for r in chunk])
+            for pk, from_type, from_id, rel, to_type, to_id, *rest in chunk:
+                yield (pk, from_type, from_id, refs[(from_type, from_id)].name,
+                       rel, to_type, to_id, refs[(to_type, to_id)].name, *rest)
 
 
 class SyncRunList(ListWithHeaders):
@@ -101,29 +342,62 @@ class SyncRunList(ListWithHeaders):
     template_name = "intelligence/syncrun_list.html"
     paginate_by = 50
     ordering = ["-started_at"]
-    headers = ["Source", "Started", "Finished", "Success", "Summary"]
+    cursor_pagination = True
+    headers = ["Source", "Started", "Finished", "Success", "Fetched",
+               "Stored", "Skipped", "Bytes", "Fetch / Write (s)", "Rows/s",
+               "Batch p95 (ms)", "Summary"]
+    export_columns = tuple((f, f) for f in (
+        "id", "source", "started_at", "finished_at", "success", "records_fetched", "records_stored",
+        "records_skipped", "bytes_fetched", "fetch_seconds", "write_seconds", "rows_per_sec",
+        "records_pruned", "bytes_pruned", "summary", "error",
+    ))
 
 
 # ---- Details ----
 class AssetDetail(DetailView):
-    model = Asset
+    queryset = Asset.objects.select_related("owner_team", "environment", "location", "business_service", "owner_person")
     template_name = "intelligence/asset_detail.html"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        access = self.object.effective_access.select_related("identity", "via_group")
+        ctx["access"] = access.order_by("access", "identity__username", "path")[:200]
+        ctx["access_count"] = access.values("identity").distinct().count()
+        return ctx
+
 
 class IdentityDetail(DetailView):
-    model = Identity
+    queryset = Identity.objects.select_related("owner_team", "manager_identity")
     template_name = "intelligence/identity_detail.html"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        access = self.object.effective_access.select_related("asset", "via_group")
+        ctx["access"] = access.order_by("access", "asset__name", "path")[:200]
+        ctx["access_count"] = access.values("asset").distinct().count()
+        return ctx
+
 
 class GroupDetail(DetailView):
-    model = Group
+    queryset = Group.objects.select_related("owner_team")
     template_name = "intelligence/group_detail.html"
 
 
 class EnvironmentDetail(DetailView):
-    model = Environment
+    queryset = Environment.objects.select_related("owner_team")
     template_name = "intelligence/environment_detail.html"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        below = subtree(Environment, self.object.pk)
+        ctx.update({
+            "ancestors": ancestors(self.object),
+            "descendants": descendants(self.object).select_related("parent_environment")[:200],
+            "descendant_count": subtree(Environment, self.object.pk, include_self=False).count(),
+            "subtree_assets": Asset.objects.filter(environment__in=below).count(),
+        })
+        return ctx
+
 
 class LocationDetail(DetailView):
     model = Location
@@ -131,7 +405,7 @@ class LocationDetail(DetailView):
 
 
 class BusinessServiceDetail(DetailView):
-    model = BusinessService
+    queryset = BusinessService.objects.select_related("owner_team")
     template_name = "intelligence/businessservice_detail.html"
 
 
@@ -139,6 +413,147 @@ class TeamDetail(DetailView):
     model = Team
     template_name = "intelligence/team_detail.html"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        below = subtree(Team, self.object.pk)
+        ctx.update({
+            "ancestors": ancestors(self.object),
+            "descendants": descendants(self.object).select_related("parent_team")[:200],
+            # Each rollup covers every sub-team in one query.
+            "rollups": [
+                ("Assets", "intelligence:asset_list", Asset.objects.filter(owner_team__in=below).count()),
+                ("Identities", "intelligence:identity_list", Identity.objects.filter(owner_team__in=below).count()),
+                ("Groups", "intelligence:group_list", Group.objects.filter(owner_team__in=below).count()),
+                ("Environments", "intelligence:environment_list", Environment.objects.filter(owner_team__in=below).count()),
+                ("Business Services", "intelligence:businessservice_list",
+                 BusinessService.objects.filter(owner_team__in=below).count()),
+            ],
+        })
+        return ctx
+
+
+# ---- Graph ----
+class BlastRadius(TemplateView):
+    """Depth-limited traversal from one entity, e.g. everything that depends on an asset."""
+    template_name = "intelligence/blast_radius.html"
+    max_depth = 10
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        entity_type = self.kwargs["entity_type"]
+        model = ENTITY_MODELS.get(entity_type)
+        if model is None:
+            raise Http404("Unknown entity type")
+        try:
+            start = model.objects.get(pk=self.kwargs["pk"])
+        except model.DoesNotExist:
+            raise Http404("No such entity")
+
+        params = self.request.GET
+        try:
+            depth = min(max(int(params.get("depth", 3)), 1), self.max_depth)
+        except ValueError:
+            depth = 3
+        direction = params.get("direction", "in")
+        if direction not in DIRECTIONS:
+            direction = "in"
+        rel_types = [t for t in params.getlist("type") if t in RelationshipType.values]
+
+        reached = blast_radius(entity_type, start.pk, direction=direction, max_depth=depth,
+                               relationship_types=rel_types or None, limit=5000)
+        refs = EntityNameResolver().resolve_many((r.entity_type, r.entity_id) for r in reached)
+        ctx.update({
+            "start": start,
+            "entity_type": EntityType(entity_type).label,
+            "reached": [(r, refs[(r.entity_type, r.entity_id)]) for r in reached],
+            "depth": depth,
+            "direction": direction,
+            "directions": DIRECTIONS,
+            "relationship_types": RelationshipType.choices,
+            "selected_types": rel_types,
+        })
+        return ctx
+
+
+class AttackPaths(TemplateView):
+    """Cheapest weighted paths from one entity to another (?to_type=&to=), top-K."""
+    template_name = "intelligence/attack_paths.html"
+    max_k = 10
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        entity_type = self.kwargs["entity_type"]
+        model = ENTITY_MODELS.get(entity_type)
+        if model is None:
+            raise Http404("Unknown entity type")
+        try:
+            start = model.objects.get(pk=self.kwargs["pk"])
+        except model.DoesNotExist:
+            raise Http404("No such entity")
+
+        params = self.request.GET
+        try:
+            k = min(max(int(params.get("k", 3)), 1), self.max_k)
+        except ValueError:
+            k = 3
+        try:
+            max_cost = float(params["max_cost"]) if params.get("max_cost") else float("inf")
+        except ValueError:
+            max_cost = float("inf")
+        direction = params.get("direction", "out")
+        if direction not in DIRECTIONS:
+            direction = "out"
+        rel_types = [t for t in params.getlist("type") if t in RelationshipType.values]
+        to_type = params.get("to_type", "")
+        try:
+            to_id = uuid.UUID(params.get("to", ""))
+        except ValueError:
+            to_id = None
+
+        paths, target = [], None
+        if to_type in ENTITY_MODELS and to_id is not None:
+            resolver = EntityNameResolver()
+            target = resolver.resolve(to_type, to_id)
+            paths = shortest_paths(entity_type, start.pk, to_type, to_id, k=k, direction=direction,
+                                   relationship_types=rel_types or None, max_cost=max_cost)
+            refs = resolver.resolve_many(node for p in paths for node in p.nodes)
+            paths = [(p, [(step, refs[step.source], refs[step.target]) for step in p.steps]) for p in paths]
+        ctx.update({
+            "start": start,
+            "entity_type": EntityType(entity_type).label,
+            "target": target,
+            "to_type": to_type,
+            "to": to_id or "",
+            "paths": paths,
+            "k": k,
+            "max_cost": "" if max_cost == float("inf") else max_cost,
+            "direction": direction,
+            "directions": DIRECTIONS,
+            "entity_types": EntityType.choices,
+            "relationship_types": RelationshipType.choices,
+            "selected_types": rel_types,
+        })
+        return ctx
+
+
+# ---- Search ----
+class Search(TemplateView):
+    """Global full-text search over the inventory (?q=, optionally ?type=<entity type>)."""
+    template_name = "intelligence/search.html"
+    limit = 50
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        q = self.request.GET.get("q", "").strip()
+        types = [t for t in self.request.GET.getlist("type") if t in ENTITY_MODELS]
+        ctx.update({
+            "q": q,
+            "hits": search(q, entity_types=types or None, limit=self.limit) if q else [],
+            "entity_types": EntityType.choices,
+            "selected_types": types,
+        })
+        return ctx
+
 
 # ---- Creates ----
 class AssetCreate(CreateView):
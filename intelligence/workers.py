@@ -0,0 +1,58 @@
+"""
+Multi-process normalization runner.
+
+Each worker process runs a ClaimingNormalizationEngine, so workers can share
+(source, record_type) partitions without double-processing rows. Workers start
+on different partitions to keep lock contention low. SQLite allows a single
+writer, so there the runner always uses one worker (see effective_workers).
+"""
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+
+def _init_worker() -> None:
+    import django
+    from django.apps import apps
+    if not apps.ready:  # spawn start method: fresh interpreter
+        django.setup()
+    from .normalization import autodiscover_mappers
+    autodiscover_mappers()
+
+
+def _work(index: int, workers: int, options: Dict[str, Any]):
+    from .normalization import ClaimingNormalizationEngine
+    engine = ClaimingNormalizationEngine(**options)
+    parts = engine.partition_list()
+    if parts:
+        shift = index % len(parts)
+        engine.partitions = parts[shift:] + parts[:shift]
+    return engine.run()
+
+
+def effective_workers(workers: Optional[int] = None) -> int:
+    from django.db import connection
+    if connection.vendor == "sqlite":
+        return 1  # single writer: extra processes would only fight over the database lock
+    return workers or os.cpu_count() or 1
+
+
+def run_workers(workers: Optional[int] = None, chunk_size: int = 1000, lease_seconds: int = 300,
+                source: Optional[str] = None, record_type: Optional[str] = None):
+    from django.db import connections
+    from .normalization import NormalizeResult, autodiscover_mappers
+
+    workers = effective_workers(workers)
+    options = dict(chunk_size=chunk_size, lease_seconds=lease_seconds, source=source, record_type=record_type)
+    autodiscover_mappers()
+    if workers == 1:
+        return _work(0, 1, options)
+
+    # Forked children must not inherit the parent's open DB sockets.
+    connections.close_all()
+    total = NormalizeResult()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for result in pool.map(_work, range(workers), [workers] * workers, [options] * workers):
+            total.merge(result)
+    return total